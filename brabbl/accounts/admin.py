@@ -8,6 +8,7 @@ from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.utils.translation import ugettext_lazy as _
 
 from brabbl.accounts import models
+from brabbl.accounts.forms import CustomerForm
 from brabbl.utils.admin import SetOfPropertiesInline
 
 
@@ -26,6 +27,7 @@ class CustomerUserInfoSettingsInline(SetOfPropertiesInline):
 
 @register(models.Customer)
 class CustomerAdmin(ModelAdmin):
+    form = CustomerForm
     inlines = [CustomerUserInfoSettingsInline]
     filter_horizontal = ('user_groups',)
 
@@ -3,17 +3,88 @@ from rest_framework import exceptions
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.fields.files import FieldFile
 from django.utils.translation import ugettext_lazy as _
 
+AUTH_CACHE_TIMEOUT = getattr(settings, 'AUTH_CACHE_TIMEOUT', 5 * 60)
+# never put password hashes into the shared cache
+SNAPSHOT_EXCLUDED_FIELDS = ('password',)
+
+
+def get_token_cache_key(key):
+    return 'brabbl:auth-token:%s' % key
+
+
+def make_user_snapshot(user):
+    """
+    Compact, cacheable representation of `user` including all permission
+    codenames.
+    """
+    values = {}
+    for field in user._meta.concrete_fields:
+        if field.attname not in SNAPSHOT_EXCLUDED_FIELDS:
+            value = getattr(user, field.attname)
+            values[field.attname] = value.name if isinstance(value, FieldFile) else value
+    return {'values': values, 'permissions': sorted(user.get_all_permissions())}
+
+
+def user_from_snapshot(snapshot):
+    """
+    Rebuild a user from `make_user_snapshot` without any query. Excluded
+    fields are deferred and loaded on access.
+    """
+    values = snapshot['values']
+    field_names = list(values)
+    user = get_user_model().from_db(
+        DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+    user._perm_cache = set(snapshot['permissions'])
+    return user
+
+
+def invalidate_user_auth(user_ids):
+    """
+    Drop the cached snapshots of all tokens of `user_ids`.
+    """
+    keys = [get_token_cache_key(key) for key in
+            Token.objects.filter(user__in=user_ids).values_list('key', flat=True)]
+    cache.delete_many(keys)
+    # other requests may cache the old state until the transaction commits
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
 
 class BrabblTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication backed by a cache of user snapshots, see
+    `make_user_snapshot`. The snapshots are invalidated by the signals in
+    `brabbl.accounts.signals` and expire after `AUTH_CACHE_TIMEOUT`.
+    """
     model = Token
 
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            user, token = result
+            customer = getattr(request, 'customer', None)
+            if customer is not None and customer.pk == user.customer_id:
+                user.customer = customer
+        return result
+
     def authenticate_credentials(self, key):
+        snapshot = cache.get(get_token_cache_key(key))
+        if snapshot is not None:
+            user = user_from_snapshot(snapshot)
+            return user, self.model(key=key, user=user)
+
         try:
             token = self.model.objects.select_related('user').get(key=key)
         except self.model.DoesNotExist:
             raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        cache.set(get_token_cache_key(key), make_user_snapshot(token.user), AUTH_CACHE_TIMEOUT)
         return token.user, token
 
 
@@ -5,6 +5,8 @@ from django.forms import widgets
 from django.contrib.auth import get_user_model
 from django.utils.translation import ugettext_lazy as _
 
+from brabbl.accounts.models import Customer
+
 User = get_user_model()
 
 
@@ -37,3 +39,18 @@ class WelcomeForm(forms.Form):
                 self.fields.pop(item)
             elif _exclude_fields[item]:
                 self.fields[item].required = True
+
+
+class CustomerForm(forms.ModelForm):
+    default_wording = forms.TypedChoiceField(coerce=int, initial=0)
+    notification_wording = forms.TypedChoiceField(coerce=int, initial=0)
+
+    class Meta:
+        model = Customer
+        fields = "__all__"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # wordings change at runtime, so the choices are only loaded here
+        self.fields['default_wording'].choices = self.instance.wording_choices()
+        self.fields['notification_wording'].choices = self.instance.notification_wording_choices()
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.core import signing
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.db.models.query import QuerySet
 from brabbl.utils import logger
 
@@ -13,7 +15,40 @@ class CustomerQuerySet(QuerySet):
             return None
 
 
-class UserManager(DjangoUserManager):
+class UserQuerySet(QuerySet):
+    """
+    Case-insensitive lookups which use the expression indexes on
+    (customer_id, LOWER(email)) and (customer_id, LOWER(username)), unlike
+    `__iexact` which compares UPPER() values.
+    """
+
+    def with_email(self, email):
+        return self.annotate(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+    def with_username(self, username):
+        return self.annotate(username_lower=Lower('username')).filter(username_lower=username.lower())
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    def get_login_username(self, customer, login):
+        """
+        Resolve what a user of `customer` entered as login with one query.
+
+        `login` may be the username of the customer specific account, a
+        plain username or the email address of one of the customer's users,
+        in this order of precedence. Returns None if nothing matches.
+        """
+        customer_username = '{}+{}'.format(login, customer.embed_token)
+        usernames = list(self.annotate(email_lower=Lower('email')).filter(
+            Q(username=customer_username) | Q(username=login) |
+            Q(customer=customer, email_lower=login.lower())
+        ).order_by('pk').values_list('username', flat=True))
+
+        for username in (customer_username, login):
+            if username in usernames:
+                return username
+        return usernames[0] if usernames else None
+
     def get_token_for(self, user):
         return signing.dumps((user.email, user.id))
 
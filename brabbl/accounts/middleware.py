@@ -17,6 +17,7 @@ from social_django.middleware import (
 
 from brabbl.utils import logger, language_utils
 from brabbl.accounts.models import Customer
+from brabbl.accounts.tenants import get_tenant
 
 
 class CustomerMiddleware(MiddlewareMixin):
@@ -40,17 +41,14 @@ class CustomerMiddleware(MiddlewareMixin):
             return HttpResponseForbidden("Missing brabbl API Token.")
 
         try:
-            request.customer = Customer.objects.get(
-                embed_token=request.META['HTTP_X_BRABBL_TOKEN'])
-            # set language for api by customer
-            request = language_utils.set_language(
-                request, request.customer.language
-            )
+            tenant = get_tenant(request.META['HTTP_X_BRABBL_TOKEN'])
         except Customer.DoesNotExist:
             return HttpResponseForbidden(_("Invalid brabbl API Token."))
 
-        allowed_domains = request.customer.allowed_domains.splitlines()
-        allowed_domains += [settings.SITE_DOMAIN, 'localhost:8000', '0.0.0.0:8000']
+        request.customer = tenant.customer
+        # set language for api by customer
+        request = language_utils.set_language(request, tenant.language)
+
         referrer = request.META.get('HTTP_REFERER', '')
         try:
             referrer_domain = referrer.split('/', 3)[2]
@@ -60,7 +58,7 @@ class CustomerMiddleware(MiddlewareMixin):
                 customer=request.customer, referrer=referrer
             )
         else:
-            if referrer_domain in allowed_domains:
+            if referrer_domain in tenant.allowed_domains:
                 return None
             logger.info(
                 _('Invalid referrer domain for customer %(customer)s: %(referrer)s'),
@@ -72,6 +70,16 @@ class CustomerMiddleware(MiddlewareMixin):
                                                                                         'referrer': referrer_domain})
 
 
+class TranslationReloadMiddleware(MiddlewareMixin):
+    """
+    Reload the gettext catalogs of this worker after PO files were saved
+    in Rosetta by any worker.
+    """
+
+    def process_request(self, request):
+        language_utils.ensure_current_translations()
+
+
 class AdminLocaleURLMiddleware(MiddlewareMixin):
     def process_request(self, request):
         if request.path.startswith('/admin'):
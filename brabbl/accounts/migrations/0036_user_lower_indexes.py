@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0035_usersession'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX accounts_user_customer_lower_email '
+            'ON accounts_user (customer_id, LOWER(email))',
+            'DROP INDEX accounts_user_customer_lower_email',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX accounts_user_customer_lower_username '
+            'ON accounts_user (customer_id, LOWER(username))',
+            'DROP INDEX accounts_user_customer_lower_username',
+        ),
+    ]
@@ -4,9 +4,9 @@ from datetime import timedelta
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Group
 from django.urls import reverse
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxLengthValidator
 from django.db import models
-from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.shortcuts import get_object_or_404
@@ -17,7 +17,10 @@ from social_django.fields import JSONField
 
 from brabbl.utils import logger
 from brabbl.utils import mail
-from brabbl.utils.models import TimestampedModelMixin, SetOfPropertiesMixin
+from brabbl.utils.models import (
+    ImageMetadataMixin, SetOfPropertiesMixin, ThumbnailsMixin, TimestampedModelMixin,
+    TrackedFieldsMixin
+)
 from brabbl.utils.string import random_string
 from brabbl.accounts import managers
 
@@ -148,18 +151,6 @@ class DataPolicyAgreement(models.Model):
 
 
 class Customer(TimestampedModelMixin, SetOfPropertiesMixin, models.Model):
-    def __init__(self, *args, **kwargs):
-        from brabbl.core.models import Wording, NotificationWording
-        super(Customer, self).__init__(*args, **kwargs)
-        choices = [(0, '---------')]
-        for wording in Wording.objects.filter(Q(customer_id=None) | Q(customer=self)):
-            choices.append((wording.pk, wording.name))
-        self._meta.get_field('default_wording')._choices = choices
-        notification_choices = [(0, '---------')]
-        for n_wording in NotificationWording.objects.all():
-            notification_choices.append((n_wording.pk, n_wording.name))
-        self._meta.get_field('notification_wording')._choices = notification_choices
-
     name = models.CharField(max_length=1024)
     embed_token = models.CharField(max_length=64, unique=True)
     flag_count_notification = models.IntegerField(default=10)
@@ -224,6 +215,30 @@ class Customer(TimestampedModelMixin, SetOfPropertiesMixin, models.Model):
             self.embed_token = random_string(size=32)
         super().save(**kwargs)
 
+    def clean(self):
+        errors = {}
+        if self.default_wording not in dict(self.wording_choices()):
+            errors['default_wording'] = _("Select a valid choice.")
+        if self.notification_wording not in dict(self.notification_wording_choices()):
+            errors['notification_wording'] = _("Select a valid choice.")
+        if errors:
+            raise ValidationError(errors)
+
+    def wording_choices(self):
+        """
+        Choices for `default_wording`: the shared wordings and the ones of
+        this customer.
+        """
+        from brabbl.core.models import Wording
+        wordings = Wording.objects.filter(customer_id=None)
+        if self.pk:
+            wordings = Wording.objects.for_customer(self)
+        return [(0, '---------')] + list(wordings.order_by('pk').values_list('pk', 'name'))
+
+    def notification_wording_choices(self):
+        from brabbl.core.models import NotificationWording
+        return [(0, '---------')] + list(NotificationWording.objects.values_list('pk', 'name'))
+
     @property
     def domain(self):
         return self.allowed_domains.splitlines()[0]
@@ -251,7 +266,7 @@ class Customer(TimestampedModelMixin, SetOfPropertiesMixin, models.Model):
                                     'flag_count': obj.flags.count()})
 
 
-class User(AbstractUser):
+class User(TrackedFieldsMixin, AbstractUser, ImageMetadataMixin, ThumbnailsMixin):
 
     NEVER = 0
     DAILY = 1
@@ -320,6 +335,8 @@ class User(AbstractUser):
 
     objects = managers.UserManager()
 
+    tracked_fields = ('image', 'username', 'first_name', 'last_name')
+
     REQUIRED_FIELDS = ['email']
 
     def __init__(self, *args, **kwargs):
@@ -461,3 +478,17 @@ class EmailTemplate(models.Model):
 
     def __str__(self):
         return self.get_key_display()
+
+
+class UserSession(models.Model):
+    """
+    Index of the sessions a user is logged in with, filled on login.
+
+    Allows to end all sessions of a user without decoding every session
+    in the database.
+    """
+    user = models.ForeignKey(User, related_name='sessions', on_delete=models.CASCADE)
+    session_key = models.CharField(max_length=40, unique=True)
+
+    def __str__(self):
+        return '{}_{}'.format(self.user_id, self.session_key)
@@ -17,27 +17,14 @@ class UserAuthTokenSerializer(AuthTokenSerializer):
 
         if username and password:
             customer = self.context['request'].customer
-            customer_username = '{}+{}'.format(username, customer.embed_token)
-
+            login = get_user_model().objects.get_login_username(customer, username)
+            # authenticate even without a matching user, so that every
+            # attempt costs exactly one password hash
             user = authenticate(
                 customer=customer,
-                username=customer_username,
-                password=password
-            ) or authenticate(
-                customer=customer,
-                username=username,
+                username=login or '{}+{}'.format(username, customer.embed_token),
                 password=password
             )
-            if user is None:
-                users = get_user_model().objects.filter(
-                    customer=customer, email=username
-                )
-                if users:
-                    user = authenticate(
-                        customer=customer,
-                        username=users[0].username,
-                        password=password
-                    )
             if user:
                 if not user.is_active:
                     msg = _("This account is inactive.")
@@ -68,9 +55,8 @@ class UserEmailSerializer(serializers.Serializer):
     def validate_email(self, email):
         UserModel = get_user_model()
         try:
-            user = UserModel._default_manager.get(
-                customer=self.context['request'].customer,
-                email__iexact=email)
+            user = UserModel._default_manager.with_email(email).get(
+                customer=self.context['request'].customer)
         except UserModel.DoesNotExist:
             raise serializers.ValidationError(_("Unknown e-mail."))
         return email
@@ -128,9 +114,7 @@ class UserSerializer(serializers.ModelSerializer):
             query = query.exclude(pk=self.instance.pk)
 
         try:
-            query.get(
-                email__iexact=value, customer=self.context['request'].customer
-            )
+            query.with_email(value).get(customer=self.context['request'].customer)
         except get_user_model().DoesNotExist:
             return value
         except:
@@ -147,10 +131,7 @@ class UserSerializer(serializers.ModelSerializer):
 
         customer = self.context['request'].customer
         try:
-            query.get(
-                username__iexact='{}+{}'.format(value, customer.embed_token),
-                customer=customer
-            )
+            query.with_username('{}+{}'.format(value, customer.embed_token)).get(customer=customer)
         except get_user_model().DoesNotExist:
             return value
 
@@ -0,0 +1,42 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+
+from brabbl.accounts.models import UserSession
+
+
+def add_user_session(user, session_key):
+    UserSession.objects.update_or_create(session_key=session_key, defaults={'user': user})
+
+
+def delete_all_unexpired_sessions_for_user(user, session_to_omit=None):
+    """
+    End all sessions of `user` with one indexed DELETE for the sessions
+    and one for their index entries.
+    """
+    user_sessions = UserSession.objects.filter(user=user)
+    if session_to_omit is not None:
+        user_sessions = user_sessions.exclude(session_key=session_to_omit.session_key)
+    Session.objects.filter(
+        session_key__in=user_sessions.values('session_key')).delete()
+    user_sessions.delete()
+
+
+def delete_stale_user_sessions():
+    """
+    Remove the index entries of sessions which no longer exist.
+    Returns the number of removed entries.
+    """
+    removed, __ = UserSession.objects.exclude(
+        session_key__in=Session.objects.values('session_key')).delete()
+    return removed
+
+
+def clear_expired_sessions():
+    """
+    Delete the expired sessions like `clearsessions` and their index
+    entries. Returns the number of removed index entries.
+    """
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+    return delete_stale_user_sessions()
@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from brabbl.accounts import models
+from rest_framework.authtoken.models import Token
+from brabbl.accounts import authentication, models, sessions, tenants
 
 
 @receiver(post_save, sender=models.Customer)
@@ -15,3 +20,66 @@ def update_embed_token_in_username(sender, instance, **kwargs):
             user.save()
         except ValueError:
             pass
+
+
+@receiver(post_save, sender=models.Customer)
+@receiver(post_delete, sender=models.Customer)
+def invalidate_tenants(sender, instance, **kwargs):
+    tenants.invalidate_tenants()
+    # other workers may reload the old row until the transaction commits
+    transaction.on_commit(tenants.invalidate_tenants)
+
+
+@receiver(user_logged_in)
+def index_user_session(sender, request, user, **kwargs):
+    session_key = request.session.session_key
+    if session_key:
+        sessions.add_user_session(user, session_key)
+
+
+@receiver(user_logged_out)
+def invalidate_auth_on_logout(sender, user, **kwargs):
+    if user is not None and user.pk:
+        authentication.invalidate_user_auth([user.pk])
+
+
+@receiver(post_save, sender=models.User)
+def invalidate_auth_on_user_change(sender, instance, created, **kwargs):
+    if not created:
+        authentication.invalidate_user_auth([instance.pk])
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_auth_on_token_delete(sender, instance, **kwargs):
+    cache.delete(authentication.get_token_cache_key(instance.key))
+
+
+def get_changed_m2m_ids(instance, action, reverse, pk_set, related_name):
+    """
+    Primary keys of the objects on the forward side of a `m2m_changed`
+    signal, or None if the action needs no handling.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            return [instance.pk]
+    elif action in ('post_add', 'post_remove'):
+        return pk_set
+    elif action == 'pre_clear':
+        return list(getattr(instance, related_name).values_list('pk', flat=True))
+    return None
+
+
+@receiver(m2m_changed, sender=models.User.groups.through)
+@receiver(m2m_changed, sender=models.User.user_permissions.through)
+def invalidate_auth_on_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    user_ids = get_changed_m2m_ids(instance, action, reverse, pk_set, 'user_set')
+    if user_ids:
+        authentication.invalidate_user_auth(user_ids)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_auth_on_group_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    group_ids = get_changed_m2m_ids(instance, action, reverse, pk_set, 'group_set')
+    if group_ids:
+        authentication.invalidate_user_auth(
+            models.User.objects.filter(groups__in=group_ids).values_list('pk', flat=True))
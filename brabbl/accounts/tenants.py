@@ -0,0 +1,65 @@
+"""
+Per-process cache of the customer ("tenant") resolved from the
+`X-Brabbl-Token` header of every API request.
+
+Each worker keeps the customers it has seen together with the data the
+middleware needs on every request. A version stored in the shared cache
+tells the workers when a customer was changed; every worker then drops
+its local entries and loads them again on demand.
+"""
+import copy
+from collections import namedtuple
+
+from django.conf import settings
+
+from brabbl.accounts.models import Customer
+from brabbl.utils.versions import bump_version, get_version
+
+TENANT_VERSION_KEY = 'brabbl:tenant-version'
+DEFAULT_ALLOWED_DOMAINS = ('localhost:8000', '0.0.0.0:8000')
+
+Tenant = namedtuple('Tenant', ['customer', 'allowed_domains', 'language'])
+
+_local = {'version': None, 'tenants': {}}
+
+
+def invalidate_tenants():
+    """
+    Make every worker reload its customers on their next request.
+    """
+    bump_version(TENANT_VERSION_KEY)
+
+
+def load_tenant(embed_token):
+    customer = Customer.objects.get(embed_token=embed_token)
+    allowed_domains = set(customer.allowed_domains.splitlines())
+    allowed_domains.update(DEFAULT_ALLOWED_DOMAINS)
+    allowed_domains.add(settings.SITE_DOMAIN)
+    return Tenant(customer, frozenset(allowed_domains), customer.language)
+
+
+def get_tenant(embed_token):
+    """
+    Return the `Tenant` for `embed_token`, raises `Customer.DoesNotExist`
+    for unknown tokens.
+
+    The customer instance is a copy which may be modified by the request
+    without affecting the cached one.
+    """
+    version = get_version(TENANT_VERSION_KEY)
+    if version != _local['version']:
+        _local['tenants'] = {}
+        _local['version'] = version
+
+    tenant = _local['tenants'].get(embed_token)
+    if tenant is None:
+        tenant = _local['tenants'][embed_token] = load_tenant(embed_token)
+    return tenant._replace(customer=copy_customer(tenant.customer))
+
+
+def copy_customer(customer):
+    clone = copy.copy(customer)
+    clone._state = copy.copy(customer._state)
+    clone._state.fields_cache = {}
+    clone.__dict__.pop('_prefetched_objects_cache', None)
+    return clone
@@ -4,6 +4,8 @@ from django.test import TestCase
 from . import factories
 from brabbl.accounts.models import User
 from brabbl.accounts.admin import UserAdmin
+from brabbl.accounts.forms import CustomerForm
+from brabbl.core.tests.factories import WordingFactory
 
 
 class AccountsAdminTestCase(TestCase):
@@ -14,3 +16,15 @@ class AccountsAdminTestCase(TestCase):
         qs = User.objects.all()
         UserAdmin.send_newsmail(None, None, qs)
         self.assertEqual(len(mail.outbox), 2)
+
+
+class CustomerFormTestCase(TestCase):
+    def test_wording_choices(self):
+        customer = factories.CustomerFactory.create()
+        wording = WordingFactory.create(customer=customer)
+        foreign = WordingFactory.create(customer=factories.CustomerFactory.create())
+
+        form = CustomerForm(instance=customer)
+        choices = dict(form.fields['default_wording'].choices)
+        self.assertIn(wording.pk, choices)
+        self.assertNotIn(foreign.pk, choices)
@@ -1,10 +1,12 @@
 import re
+from unittest import mock
 
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
 
 from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
 from django.core import mail
 from django.urls import reverse
 from django.template.defaultfilters import urlencode
@@ -12,6 +14,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from brabbl.accounts.models import User, Customer
 from brabbl.accounts.tests.factories import CustomerFactory, StaffFactory, UserFactory, GroupFactory
+from brabbl.core.tests.factories import make_image
 from brabbl.utils import test
 from brabbl.utils.test import BrabblClient
 
@@ -62,6 +65,17 @@ class AccountAPITest(test.CreateTestMixin,
                 self.assertEqual(response.data[field], value)
         return response
 
+    def test_update_image_multipart(self):
+        self.set_update_headers()
+        response = self.client.patch(
+            self.get_update_url(), data={'image': make_image(size=(40, 30))}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('original', response.data['image'])
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.image.name.endswith('.png'))
+        self.assertEqual((self.user.image_width, self.user.image_height), (40, 30))
+
     def get_retrieve_url(self, obj=None):
         return reverse('v1:{0}-profile'.format(self.base_name))
 
@@ -161,6 +175,34 @@ class LoginAPITest(test.CreateTestMixin,
         response = self.create(status_code=status.HTTP_400_BAD_REQUEST)
         self.assertTrue('non_field_errors' in response.data)
 
+    def test_login_with_email(self):
+        data = {'username': self.user.email.upper(), 'password': self.user_password}
+        response = self.create(data=data)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+
+    def test_login_prefers_customer_username(self):
+        customer_user = UserFactory.create(
+            customer=self.customer,
+            username='{}+{}'.format(self.user.username, self.customer.embed_token))
+        customer_user.set_password('other')
+        customer_user.save()
+
+        data = {'username': self.user.username, 'password': 'other'}
+        response = self.create(data=data)
+        self.assertEqual(response.data['token'], Token.objects.get(user=customer_user).key)
+
+    def test_login_hashes_password_once(self):
+        self.set_create_headers()
+        encode = PBKDF2PasswordHasher.encode
+        for username, password in [(self.user.username, self.user_password),
+                                   (self.user.username, 'wrong'),
+                                   ('unknown', 'wrong')]:
+            with mock.patch.object(PBKDF2PasswordHasher, 'encode', autospec=True,
+                                   side_effect=encode) as hasher:
+                self.client.post(self.get_create_url(), format='json',
+                                 data={'username': username, 'password': password})
+            self.assertEqual(hasher.call_count, 1)
+
 
 class PasswordResetAPITest(test.CreateTestMixin,
                            test.BrabblAPITestCase):
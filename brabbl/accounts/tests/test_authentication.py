@@ -0,0 +1,91 @@
+from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from brabbl.accounts.authentication import BrabblTokenAuthentication, get_token_cache_key
+from . import factories
+
+
+class BrabblTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        self.user = factories.UserFactory.create()
+        self.token = Token.objects.create(user=self.user)
+        self.auth = BrabblTokenAuthentication()
+
+    def authenticate(self):
+        user, token = self.auth.authenticate_credentials(self.token.key)
+        return user
+
+    def test_cached_user(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertEqual(user.customer_id, self.user.customer_id)
+            self.assertEqual(user.username, self.user.username)
+            self.assertTrue(user.is_active)
+            self.assertFalse(user.has_perm('core.change_discussion'))
+
+        # the password is not cached but loaded on demand
+        self.user.set_password('secret')
+        self.user.save()
+        self.assertTrue(self.authenticate().check_password('secret'))
+
+    def test_invalid_token(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials('invalid')
+
+    def test_saving_cached_user_keeps_password(self):
+        self.user.set_password('secret')
+        self.user.save()
+        self.authenticate()
+
+        user = self.authenticate()
+        user.first_name = 'Changed'
+        user.save()
+        user = self.authenticate()
+        self.assertEqual(user.first_name, 'Changed')
+        self.assertTrue(user.check_password('secret'))
+
+    def test_invalidate_on_permission_change(self):
+        permission = Permission.objects.get(codename='change_discussion')
+        self.assertFalse(self.authenticate().has_perm('core.change_discussion'))
+
+        self.user.user_permissions.add(permission)
+        self.assertTrue(self.authenticate().has_perm('core.change_discussion'))
+
+        self.user.user_permissions.clear()
+        self.assertFalse(self.authenticate().has_perm('core.change_discussion'))
+
+    def test_invalidate_on_group_change(self):
+        group = Group.objects.create(name='moderators')
+        self.authenticate()
+
+        group.user_set.add(self.user)
+        group.permissions.add(Permission.objects.get(codename='change_discussion'))
+        self.assertTrue(self.authenticate().has_perm('core.change_discussion'))
+
+        group.user_set.clear()
+        self.assertFalse(self.authenticate().has_perm('core.change_discussion'))
+
+    def test_invalidate_on_deactivation(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.authenticate().is_active)
+
+    def test_invalidate_on_token_delete(self):
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_invalidate_on_logout(self):
+        self.authenticate()
+        key = get_token_cache_key(self.token.key)
+        self.assertIsNotNone(cache.get(key))
+        user_logged_out.send(sender=type(self.user), request=None, user=self.user)
+        self.assertIsNone(cache.get(key))
@@ -17,3 +17,23 @@ class UserManagerTest(TestCase):
         token = User.objects.get_token_for(self.user)
         user = User.objects.get_by_token(token)
         self.assertEqual(user.id, self.user.id)
+
+    def test_with_email(self):
+        other = factories.UserFactory.create(email=self.user.email.upper())
+        users = User.objects.with_email(self.user.email.title())
+        self.assertEqual(set(users), {self.user, other})
+        self.assertEqual(users.get(customer=self.user.customer), self.user)
+
+    def test_with_username(self):
+        self.assertEqual(User.objects.with_username(self.user.username.upper()).get(), self.user)
+
+    def test_get_login_username(self):
+        customer = self.user.customer
+        self.assertEqual(
+            User.objects.get_login_username(customer, self.user.email.upper()), self.user.username)
+        self.assertEqual(
+            User.objects.get_login_username(customer, self.user.username), self.user.username)
+        self.assertIsNone(User.objects.get_login_username(customer, 'unknown'))
+        # email addresses of other customers' users do not match
+        other = factories.UserFactory.create()
+        self.assertIsNone(User.objects.get_login_username(customer, other.email))
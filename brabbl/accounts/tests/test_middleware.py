@@ -2,6 +2,7 @@ from django.urls import reverse
 from django.utils.translation import ugettext as _
 from rest_framework.test import APITestCase
 
+from brabbl.accounts import tenants
 from .factories import CustomerFactory
 
 
@@ -28,3 +29,56 @@ class MiddlewareTest(APITestCase):
 
         self.assertEqual(response.status_code, 401)  # no creden
         self.assertNotEqual(response.content.decode("utf-8"), _('Invalid brabbl API Token.'))
+
+    def test_invalid_referrer_domain(self):
+        customer = CustomerFactory.create()
+        response = self.client.get(reverse('v1:customer'),
+                                   HTTP_X_BRABBL_TOKEN=customer.embed_token,
+                                   HTTP_REFERER='http://evil.example.com/page/')
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(reverse('v1:customer'),
+                                   HTTP_X_BRABBL_TOKEN=customer.embed_token,
+                                   HTTP_REFERER='http://%s/page/' % customer.domain)
+        self.assertEqual(response.status_code, 200)
+
+
+class TenantCacheTest(APITestCase):
+    def get_customer(self, customer):
+        return self.client.get(reverse('v1:customer'),
+                               HTTP_X_BRABBL_TOKEN=customer.embed_token)
+
+    def test_customer_is_cached(self):
+        customer = CustomerFactory.create()
+        self.get_customer(customer)
+        # the customer serializer itself still needs its user info settings
+        with self.assertNumQueries(1):
+            response = self.get_customer(customer)
+        self.assertEqual(response.data['language'], customer.language)
+
+    def test_saving_customer_invalidates_cache(self):
+        customer = CustomerFactory.create()
+        self.get_customer(customer)
+
+        customer.language = 'de'
+        customer.save()
+        self.assertEqual(self.get_customer(customer).data['language'], 'de')
+
+        old_token = customer.embed_token
+        customer.embed_token = 'new-token'
+        customer.save()
+        response = self.client.get(reverse('v1:customer'), HTTP_X_BRABBL_TOKEN=old_token)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get_customer(customer).status_code, 200)
+
+    def test_deleting_customer_invalidates_cache(self):
+        customer = CustomerFactory.create()
+        self.get_customer(customer)
+        customer.delete()
+        self.assertEqual(self.get_customer(customer).status_code, 403)
+
+    def test_request_gets_a_copy(self):
+        customer = CustomerFactory.create()
+        tenant = tenants.get_tenant(customer.embed_token)
+        tenant.customer.name = 'Changed'
+        self.assertEqual(tenants.get_tenant(customer.embed_token).customer.name, customer.name)
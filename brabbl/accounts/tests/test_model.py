@@ -1,9 +1,11 @@
 from datetime import date
 
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
 from . import factories
 from brabbl.accounts.models import User, UserSocialAuth, Customer, DataPolicyAgreement
+from brabbl.core.tests.factories import WordingFactory
 
 
 class SocialAuthMixinTestCase(TestCase):
@@ -53,3 +55,33 @@ class UserModelTest(TestCase):
         customer.displayed_username = Customer.DISPLAY_NAME_LAST_NAME
         customer.save()
         self.assertEqual(user.display_name, "%s %s" % (user.first_name, user.last_name))
+
+
+class CustomerModelTest(TestCase):
+    def test_loading_customers_runs_no_extra_queries(self):
+        factories.CustomerFactory.create_batch(3)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(Customer.objects.all())), 3)
+
+    def test_wording_choices(self):
+        customer, other = factories.CustomerFactory.create_batch(2)
+        shared = WordingFactory.create()
+        own = WordingFactory.create(customer=customer)
+        WordingFactory.create(customer=other)
+
+        self.assertEqual(customer.wording_choices(), [
+            (0, '---------'), (shared.pk, shared.name), (own.pk, own.name)])
+        self.assertEqual(Customer().wording_choices(), [
+            (0, '---------'), (shared.pk, shared.name)])
+
+    def test_clean_validates_wordings(self):
+        customer = factories.CustomerFactory.create()
+        wording = WordingFactory.create(customer=factories.CustomerFactory.create())
+        customer.full_clean()
+
+        customer.default_wording = wording.pk
+        customer.notification_wording = 12345
+        with self.assertRaises(ValidationError) as cm:
+            customer.full_clean()
+        self.assertEqual(
+            set(cm.exception.message_dict), {'default_wording', 'notification_wording'})
@@ -0,0 +1,59 @@
+from django.contrib.sessions.models import Session
+from django.test import Client, TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from brabbl.accounts.models import UserSession
+from brabbl.accounts.sessions import delete_all_unexpired_sessions_for_user
+from brabbl.utils.test import BrabblAPITestCase
+from . import factories
+
+
+class UserSessionTest(TestCase):
+    def setUp(self):
+        self.user = factories.UserFactory.create()
+        self.user.set_password('secret')
+        self.user.save()
+
+    def login(self, user=None):
+        client = Client()
+        if user is None:
+            self.assertTrue(client.login(username=self.user.username, password='secret'))
+        else:
+            client.force_login(user)
+        return client.session.session_key
+
+    def test_login_indexes_session(self):
+        session_keys = {self.login() for i in range(2)}
+        self.assertEqual(
+            set(self.user.sessions.values_list('session_key', flat=True)), session_keys)
+
+    def test_delete_all_sessions(self):
+        self.login()
+        keep = Session.objects.get(session_key=self.login())
+        other_session = self.login(factories.UserFactory.create())
+
+        with self.assertNumQueries(2):
+            delete_all_unexpired_sessions_for_user(self.user, session_to_omit=keep)
+        self.assertEqual(
+            set(Session.objects.values_list('session_key', flat=True)),
+            {keep.session_key, other_session})
+        self.assertEqual(
+            set(UserSession.objects.values_list('session_key', flat=True)),
+            {keep.session_key, other_session})
+
+        delete_all_unexpired_sessions_for_user(self.user)
+        self.assertFalse(Session.objects.filter(session_key=keep.session_key).exists())
+
+
+class LogoutAPITest(BrabblAPITestCase):
+    def test_logout_deletes_sessions(self):
+        self.client.force_login(self.user)
+        self.client.as_customer(self.customer)
+        self.client.as_user(self.user)
+        Token.objects.get_or_create(user=self.user)
+
+        response = self.client.get(reverse('v1:user-logout'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(UserSession.objects.filter(user=self.user).exists())
+        self.assertFalse(Session.objects.exists())
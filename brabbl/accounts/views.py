@@ -24,7 +24,8 @@ from brabbl.core.models import MarkdownWordingMessage
 from brabbl.core.permissions import IsAuthenticated
 from brabbl.utils import language_utils
 from brabbl.utils.http import get_next_url
-from brabbl.utils.models import delete_all_unexpired_sessions_for_user
+from brabbl.utils.serializers import IMAGE_UPLOAD_PARSER_CLASSES
+from brabbl.accounts.sessions import delete_all_unexpired_sessions_for_user
 
 
 class WelcomeView(FormView):
@@ -185,6 +186,7 @@ class UserLogoutAPIView(views.APIView):
 class UserRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
     model = get_user_model()
     permission_classes = [IsAuthenticated]
+    parser_classes = IMAGE_UPLOAD_PARSER_CLASSES
     serializer_class = serializers.UserSerializer
 
     def get_object(self):
@@ -205,8 +207,8 @@ class PasswordResetAPIView(views.APIView):
         serializer.is_valid(raise_exception=True)
 
         UserModel = get_user_model()
-        user = UserModel._default_manager.get(customer=request.customer, email__iexact=serializer.data['email'],
-                                              is_active=True)
+        user = UserModel._default_manager.with_email(serializer.data['email']).get(
+            customer=request.customer, is_active=True)
 
         user.send_password_reset_mail(request.customer,
                                       source_url=request.META.get('HTTP_REFERER'))
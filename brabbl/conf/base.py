@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'brabbl.accounts.middleware.TranslationReloadMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -151,10 +152,42 @@ DEFAULT_USER_RATING = 3
 # users need to confirm their email after this amount of days
 MAX_EMAIL_CONFIRMATION_DAYS = 7
 
+# seconds clients may cache the frontend translations
+TRANSLATION_CACHE_MAX_AGE = 24 * 60 * 60
+
+# seconds a rendered discussion payload is cached, bounds the delay of
+# changes not covered by its versions, e.g. edited translations
+DISCUSSION_CACHE_TIMEOUT = 15 * 60
+
+# thumbnails generated for every uploaded image, see `ThumbnailsMixin`
+THUMBNAIL_ALIASES = {
+    '': {
+        'small': {'size': (16, 16), 'crop': True},
+    },
+    'core.Statement.image': {
+        'preview': {'size': (100, 70), 'crop': True},
+    },
+    'core.Discussion.image': {
+        'preview': {'size': (300, 200), 'crop': True},
+    },
+    'accounts.User.image': {
+        'avatar': {'size': (48, 48), 'crop': True},
+        'profile': {'size': (128, 128), 'crop': True},
+    },
+}
+
+# bytes an uploaded image may have, see `Base64ImageField`
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+
+# larger images are scaled down in the background after the upload
+IMAGE_MAX_DIMENSION = 2048
+
 CRONJOBS = [
     ('0 16 * * *', 'django.core.management.newsmail'),
     ('0 14 * * *', 'django.core.management.non_confirmed_users_warning_letter'),
     # ('0 2 * * *', 'django.core.management.delete_non_confirmed_users'),
+    ('* * * * *', 'django.core.management.flush_buffered_votes'),
+    ('0 3 * * *', 'django.core.management.clear_expired_sessions'),
 ]
 
 SOCIAL_AUTH_FIELDS_STORED_IN_SESSION = ['customer_token', 'back_url']
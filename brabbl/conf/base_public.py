@@ -13,6 +13,8 @@ RAVEN_CONFIG = {
 
 INSTALLED_APPS.append('raven.contrib.django.raven_compat')
 
+# every environment on the host uses its own DB, jobs and the vote buffer
+# only refer to rows of that environment's database
 RQ_QUEUES = {
     'default': {
         'HOST': 'localhost',
@@ -69,3 +71,11 @@ LOGGING = {
         },
     },
 }
+
+# shared by the environments on the host, each sets its own KEY_PREFIX
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    },
+}
@@ -7,6 +7,8 @@ ALLOWED_HOSTS = ['api.brabbl.com']
 
 SESSION_COOKIE_SECURE = True
 
+CACHES['default']['KEY_PREFIX'] = 'brabbl-production'
+
 EMAIL_BACKEND = 'django_mailgun.MailgunBackend'
 MAILGUN_ACCESS_KEY = ''
 MAILGUN_SERVER_NAME = 'brabbl.com'
@@ -7,6 +7,8 @@ SESSION_COOKIE_SECURE = False
 ALLOWED_HOSTS = ['staging.api.brabbl.com']
 SITE_DOMAIN = 'staging.api.brabbl.com'
 DATABASES['default']['NAME'] = 'brabbl-staging'
+RQ_QUEUES['default']['DB'] = 2
+CACHES['default']['KEY_PREFIX'] = 'brabbl-staging'
 GUNICORN_PID_FILE = os.path.expanduser('~brabbl-staging/run/gunicorn.pid')
 
 SOCIAL_AUTH_FACEBOOK_KEY = ''
@@ -1,4 +1,7 @@
+import atexit
 import logging
+import shutil
+import tempfile
 import warnings
 from .dev import *
 
@@ -7,6 +10,10 @@ COMPRESS_ENABLED = False
 
 TESTING = True
 
+# uploads and thumbnails of the tests never end up in the working tree
+MEDIA_ROOT = tempfile.mkdtemp(prefix='brabbl-media-')
+atexit.register(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+
 ALLOWED_HOSTS = ['*']
 
 REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].append(
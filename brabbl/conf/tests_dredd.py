@@ -1,9 +1,11 @@
 from .tests import *
 
 
+# upserts and JSON fields need PostgreSQL like in production, the database
+# has to exist (`createdb brabbl_dredd`) and is emptied after every run
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': '/tmp/brabbl_test.sqlite',
+        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'NAME': 'brabbl_dredd',
     }
 }
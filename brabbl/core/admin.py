@@ -8,7 +8,6 @@ from django.utils.translation import ugettext_lazy as _
 
 from brabbl.core.forms import DiscussionForm
 from brabbl.utils.admin import SetOfPropertiesInline
-from brabbl.utils.models import get_thumbnail_url
 from . import models
 
 
@@ -131,7 +130,7 @@ class DiscussionAdmin(ModelAdmin):
         (_("Properties"), {
             'fields': (
                 'has_barometer', 'has_arguments', 'has_replies', 'multiple_statements_allowed',
-                'user_can_add_replies', 'barometer_wording',
+                'user_can_add_replies', 'barometer_wording', 'buffered_votes',
             )
         }),
         (_("Time limit"), {
@@ -142,7 +141,7 @@ class DiscussionAdmin(ModelAdmin):
     def show_image(self, obj):
         url = obj.image_url
         if obj.image:
-            url = get_thumbnail_url(obj.image, {'size': (100, 70), 'crop': True})
+            url = obj.thumbnail_url('preview')
         return format_html('<img style="width:100px" src="{}" />', url)
 
 
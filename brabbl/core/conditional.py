@@ -0,0 +1,75 @@
+"""
+Conditional GET for the discussion API.
+
+The ETag of a response is derived from the activity timestamps of the
+discussions it shows, the customer, the language, the content version of
+the customer (see `payloads.get_content_versions`) and, for responses
+with viewer specific fields, the user's permissions and overlay version.
+It is computed with a single query, so a matching `If-None-Match` is
+answered with 304 before anything is serialized.
+
+There is no `Last-Modified`: a date can't tell about changes of the
+customer, its language or the content version.
+"""
+import hashlib
+
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from brabbl.core.payloads import get_content_versions
+from brabbl.utils.versions import bump_version, get_version
+
+
+def get_overlay_version_key(user_id):
+    return 'brabbl:overlay-version:{}'.format(user_id)
+
+
+def invalidate_overlay(user):
+    """
+    Outdate the validators of `user` for changes of the viewer specific
+    fields which do not show up in the activity, e.g. buffered votes.
+    """
+    bump_version(get_overlay_version_key(user.pk))
+
+
+def get_validators(request, last_modified, *parts, personal=True):
+    """
+    Validators of a response showing data last changed at `last_modified`
+    and identified by `parts`. `personal` responses contain viewer
+    specific fields.
+    """
+    user = request.user
+    personal = personal and user.is_authenticated
+    values = [request.customer.pk, request.customer.modified_at, translation.get_language(),
+              get_content_versions(request.customer), last_modified]
+    values.extend(parts)
+    if personal:
+        values += [user.pk, sorted(user.get_all_permissions()),
+                   get_version(get_overlay_version_key(user.pk))]
+    return {
+        'etag': quote_etag(hashlib.sha1(repr(values).encode()).hexdigest()),
+        'personal': personal,
+    }
+
+
+def get_not_modified_response(request, validators):
+    """
+    A 304 response if the client's copy matches `validators`, else `None`.
+    """
+    if validators is None:
+        return None
+    return get_conditional_response(request, etag=validators['etag'])
+
+
+def patch_validators(response, validators):
+    if validators is None or response.status_code not in (200, 304):
+        return response
+    response['ETag'] = validators['etag']
+    patch_vary_headers(response, ['Authorization', 'X-Brabbl-Token'])
+    # clients have to revalidate, which is cheap
+    if validators['personal']:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,138 @@
+from django.db.models import Count, prefetch_related_objects
+
+from brabbl.accounts.models import Customer, User
+from brabbl.utils.vote_buffer import get_pending_votes
+from . import models
+
+
+def load_authors(objs, customers=()):
+    """
+    Attach `created_by` and the author's customer to all `objs`.
+
+    Uses one query for all users and at most one query for the customers
+    which are not passed in through `customers`.
+    """
+    user_ids = {obj.created_by_id for obj in objs}
+    users = {user.pk: user for user in User.objects.filter(pk__in=user_ids)}
+
+    known_customers = {customer.pk: customer for customer in customers}
+    customer_ids = {user.customer_id for user in users.values()}
+    customer_ids -= set(known_customers) | {None}
+    if customer_ids:
+        known_customers.update(
+            (customer.pk, customer)
+            for customer in Customer.objects.filter(pk__in=customer_ids))
+
+    for user in users.values():
+        if user.customer_id:
+            user.customer = known_customers[user.customer_id]
+    for obj in objs:
+        obj.created_by = users[obj.created_by_id]
+
+
+def load_statement_tree(statements, discussion):
+    """
+    Preload everything `StatementSerializer` renders for `statements`.
+
+    Visible top-level arguments and their reply counts are fetched with
+    one query each, independent of the number of statements and arguments.
+    """
+    statements = list(statements)
+    arguments = list(
+        models.Argument.objects.visible().without_replies().filter(
+            statement__in=statements))
+
+    reply_counts = dict(
+        models.Argument.objects.visible().filter(
+            reply_to__in=arguments
+        ).order_by().values_list('reply_to').annotate(Count('pk')))
+
+    arguments_by_statement = {}
+    for argument in arguments:
+        argument.visible_reply_count = reply_counts.get(argument.pk, 0)
+        arguments_by_statement.setdefault(argument.statement_id, []).append(argument)
+
+    for statement in statements:
+        statement.discussion = discussion
+        statement.visible_arguments = arguments_by_statement.get(statement.pk, [])
+        for argument in statement.visible_arguments:
+            argument.statement = statement
+
+    return statements, arguments
+
+
+def load_discussion_items(discussion):
+    """
+    Visible statements of `discussion` and their visible top-level
+    arguments, fetched with two queries.
+    """
+    statements = list(discussion.statements.visible())
+    arguments = list(
+        models.Argument.objects.visible().without_replies().filter(
+            statement__in=statements))
+    return statements, arguments
+
+
+def load_discussion_tree(discussion, customer=None):
+    """
+    Preload the complete tree rendered by `DiscussionSerializer`.
+
+    The number of queries stays the same no matter how many statements,
+    arguments, replies or votes the discussion has.
+    """
+    if customer is not None and customer.pk == discussion.customer_id:
+        discussion.customer = customer
+    prefetch_related_objects([discussion], 'tags', 'barometer_wording__words')
+
+    statements, arguments = load_statement_tree(
+        discussion.statements.visible(), discussion)
+    discussion.visible_statements = statements
+
+    load_authors([discussion] + statements + arguments,
+                 customers=[discussion.customer])
+    return discussion
+
+
+class UserOverlay(object):
+    """
+    The current user's barometer votes and argument ratings.
+
+    Serializers look up `user_rating` here instead of querying once per
+    statement and argument.
+    """
+
+    def __init__(self, user, votes=None, ratings=None):
+        self.user = user
+        self.votes = votes or {}
+        self.ratings = ratings or {}
+
+    @classmethod
+    def for_discussion(cls, user, discussion):
+        """
+        Load all votes and ratings of `user` within `discussion` using
+        two queries. Anonymous users get an empty overlay.
+        """
+        if user.is_anonymous:
+            return cls(user)
+
+        votes = models.BarometerVote.objects.filter(
+            user=user, statement__discussion=discussion
+        ).values_list('statement_id', 'value')
+        ratings = models.Rating.objects.filter(
+            user=user, argument__statement__discussion=discussion
+        ).values_list('argument_id', 'value')
+        votes = dict(votes)
+
+        if discussion.buffered_votes:
+            # read your own votes before they are flushed
+            statements = getattr(discussion, 'visible_statements', None)
+            if statements is None:
+                statements = discussion.statements.visible()
+            votes.update(get_pending_votes(user, [statement.pk for statement in statements]))
+        return cls(user, votes=votes, ratings=dict(ratings))
+
+    def vote_for(self, statement):
+        return self.votes.get(statement.pk)
+
+    def rating_for(self, argument):
+        return self.ratings.get(argument.pk)
@@ -0,0 +1,48 @@
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from brabbl.accounts.models import Customer, User
+from brabbl.accounts.serializers import UserAuthTokenSerializer
+from brabbl.utils.string import random_string
+
+
+class Command(BaseCommand):
+    help = 'Measures the CPU time per login attempt with a temporary customer and user'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--attempts', type=int, dest='attempts', default=5,
+            help='Number of login attempts per case')
+
+    def handle(self, *args, **options):
+        attempts = options.get('attempts') or 5
+        with transaction.atomic():
+            customer = Customer.objects.create(
+                name='benchmark', allowed_domains='localhost', moderator_email='benchmark@example.com')
+            username = random_string(size=16)
+            user = User(username='{}+{}'.format(username, customer.embed_token),
+                        email='{}@example.com'.format(username), customer=customer)
+            user.set_password('password')
+            user.save()
+
+            cases = [
+                ('valid password', username, 'password'),
+                ('email address', user.email.upper(), 'password'),
+                ('wrong password', username, 'wrong'),
+                ('unknown user', 'unknown', 'password'),
+            ]
+            for name, login, password in cases:
+                self.stdout.write('{:<16} {:8.1f} ms CPU per attempt'.format(
+                    name, self.measure(customer, login, password, attempts)))
+            transaction.set_rollback(True)
+
+    def measure(self, customer, login, password, attempts):
+        context = {'request': SimpleNamespace(customer=customer)}
+        start = time.process_time()
+        for i in range(attempts):
+            UserAuthTokenSerializer(
+                data={'username': login, 'password': password}, context=context).is_valid()
+        return (time.process_time() - start) * 1000 / attempts
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from brabbl.accounts.sessions import clear_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Deletes the expired sessions and their entries in the session index'
+
+    def handle(self, *args, **options):
+        removed = clear_expired_sessions()
+        self.stdout.write('Removed {} stale session index entries'.format(removed))
@@ -4,8 +4,6 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 
 from brabbl.accounts.models import User
-from brabbl.core.models import Argument
-from brabbl.utils import rating
 
 
 class Command(BaseCommand):
@@ -13,10 +11,5 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         time_threshold = timezone.now() - timedelta(hours=24)
-        users = User.objects.filter(is_confirmed=False, date_joined__lt=time_threshold)
-        argument_list = set()
-        for user in users:
-            argument_list |= set(user.rating_set.values_list('pk', flat=True))
-        users.delete()
-        for argument in Argument.objects.filter(pk__in=argument_list):
-            rating.denormalize_argument_rating(argument)
+        # the ratings of deleted users are removed from the arguments by signals
+        User.objects.filter(is_confirmed=False, date_joined__lt=time_threshold).delete()
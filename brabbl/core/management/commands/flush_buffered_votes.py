@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from brabbl.utils.vote_buffer import flush_buffered_votes
+
+
+class Command(BaseCommand):
+    help = 'Applies the buffered barometer votes of discussions with buffered votes'
+
+    def handle(self, *args, **options):
+        count = flush_buffered_votes()
+        self.stdout.write('Applied {} votes'.format(count))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from brabbl.accounts.models import User
+from brabbl.core import tasks
+from brabbl.core.models import Discussion, Statement
+
+
+class Command(BaseCommand):
+    help = ('Enqueues the thumbnail generation of all images which have no thumbnails '
+            'or no recorded metadata yet')
+
+    def handle(self, *args, **options):
+        count = 0
+        for model in (Discussion, Statement, User):
+            instances = model.objects.exclude(image='').exclude(image__isnull=True).filter(
+                Q(thumbnails={}) | Q(image_size__isnull=True)).only('pk', 'image')
+            for instance in instances.iterator():
+                tasks.enqueue_thumbnails(instance)
+                count += 1
+        self.stdout.write('Enqueued {} thumbnail jobs'.format(count))
@@ -0,0 +1,50 @@
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from brabbl.accounts.models import User, UserSession
+from brabbl.accounts.sessions import delete_stale_user_sessions
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Adds all unexpired sessions which were created before the session index '
+            'to the index and removes index entries of sessions which no longer exist')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, dest='chunk_size', default=DEFAULT_CHUNK_SIZE,
+            help='Number of sessions to decode per query')
+
+    def handle(self, *args, **options):
+        indexed = self.index_sessions(options.get('chunk_size') or DEFAULT_CHUNK_SIZE)
+        removed = delete_stale_user_sessions()
+        self.stdout.write('Indexed {} sessions, removed {} stale entries'.format(indexed, removed))
+
+    def index_sessions(self, chunk_size):
+        sessions = Session.objects.filter(expire_date__gte=timezone.now()).exclude(
+            session_key__in=UserSession.objects.values('session_key')
+        ).order_by('session_key')
+
+        indexed = 0
+        last_key = ''
+        while True:
+            chunk = list(sessions.filter(session_key__gt=last_key)[:chunk_size])
+            if not chunk:
+                return indexed
+            last_key = chunk[-1].session_key
+
+            user_ids = {}
+            for session in chunk:
+                user_id = session.get_decoded().get('_auth_user_id')
+                if user_id:
+                    user_ids[session.session_key] = int(user_id)
+            existing = set(User.objects.filter(
+                pk__in=set(user_ids.values())).values_list('pk', flat=True))
+            user_sessions = [
+                UserSession(user_id=user_id, session_key=session_key)
+                for session_key, user_id in user_ids.items() if user_id in existing]
+            UserSession.objects.bulk_create(user_sessions)
+            indexed += len(user_sessions)
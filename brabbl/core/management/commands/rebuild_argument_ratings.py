@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from brabbl.core.models import Argument
+from brabbl.utils.rating import rebuild_argument_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recounts the denormalized ratings of all arguments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--discussion', type=int, dest='discussion',
+            help='Only rebuild the arguments of the discussion with this id')
+
+    def handle(self, *args, **options):
+        arguments = Argument.objects.all()
+        if options.get('discussion'):
+            arguments = arguments.filter(statement__discussion_id=options['discussion'])
+        count = rebuild_argument_ratings(arguments)
+        self.stdout.write('Rebuilt {} arguments'.format(count))
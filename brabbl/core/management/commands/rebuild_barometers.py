@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from brabbl.core.models import Statement
+from brabbl.utils.barometer import rebuild_barometers
+
+
+class Command(BaseCommand):
+    help = 'Recounts the denormalized barometer values of all statements'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--discussion', type=int, dest='discussion',
+            help='Only rebuild the statements of the discussion with this id')
+
+    def handle(self, *args, **options):
+        statements = Statement.objects.all()
+        if options.get('discussion'):
+            statements = statements.filter(discussion_id=options['discussion'])
+        count = rebuild_barometers(statements)
+        self.stdout.write('Rebuilt {} statements'.format(count))
@@ -0,0 +1,75 @@
+# Generated by Django 2.0.6 on 2026-10-17 00:39
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+HISTOGRAM_FIELDS = {
+    -3: 'barometer_count_minus_3',
+    -2: 'barometer_count_minus_2',
+    -1: 'barometer_count_minus_1',
+    0: 'barometer_count_0',
+    1: 'barometer_count_plus_1',
+    2: 'barometer_count_plus_2',
+    3: 'barometer_count_plus_3',
+}
+
+
+def count_barometer_votes(apps, schema_editor):
+    Statement = apps.get_model('core', 'Statement')
+    BarometerVote = apps.get_model('core', 'BarometerVote')
+    votes = BarometerVote.objects.filter(
+        statement=OuterRef('pk')).order_by().values('statement')
+    Statement.objects.update(**{
+        field: Coalesce(Subquery(
+            votes.filter(value=value).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField()), 0)
+        for value, field in HISTOGRAM_FIELDS.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_statement_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_count_0',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_count_minus_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_count_minus_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_count_minus_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_count_plus_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_count_plus_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_count_plus_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_barometer_votes, migrations.RunPython.noop),
+    ]
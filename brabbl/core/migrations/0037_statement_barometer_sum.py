@@ -0,0 +1,31 @@
+# Generated by Django 2.0.6 on 2026-10-17 00:43
+
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def sum_barometer_votes(apps, schema_editor):
+    Statement = apps.get_model('core', 'Statement')
+    BarometerVote = apps.get_model('core', 'BarometerVote')
+    votes = BarometerVote.objects.filter(
+        statement=OuterRef('pk')).order_by().values('statement')
+    Statement.objects.update(barometer_sum=Coalesce(Subquery(
+        votes.annotate(total=Sum('value')).values('total'),
+        output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_statement_barometer_histogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='barometer_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(sum_barometer_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.0.6 on 2026-10-17 00:46
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def sum_ratings(apps, schema_editor):
+    Argument = apps.get_model('core', 'Argument')
+    Rating = apps.get_model('core', 'Rating')
+    ratings = Rating.objects.filter(
+        argument=OuterRef('pk')).order_by().values('argument')
+    Argument.objects.update(rating_sum=Coalesce(Subquery(
+        ratings.annotate(total=Sum('value')).values('total'),
+        output_field=DecimalField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_statement_barometer_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='argument',
+            name='rating_sum',
+            field=models.DecimalField(decimal_places=1, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(sum_ratings, migrations.RunPython.noop),
+    ]
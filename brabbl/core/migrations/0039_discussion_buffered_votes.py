@@ -0,0 +1,18 @@
+# Generated by Django 2.0.6 on 2026-10-17 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_argument_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='buffered_votes',
+            field=models.BooleanField(default=False, help_text='Collect barometer votes and apply them in batches. Only needed for polls with very high traffic.', verbose_name='Buffered votes'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.0.6 on 2026-10-17 01:48
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_discussion_buffered_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='thumbnails',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='statement',
+            name='thumbnails',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
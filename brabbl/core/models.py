@@ -9,7 +9,10 @@ from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 
 from brabbl.accounts.models import Customer, User
-from brabbl.utils.models import TimestampedModelMixin, LastActivityMixin, SetOfPropertiesMixin
+from brabbl.utils.models import (
+    DenormalizedFieldsMixin, ImageMetadataMixin, LastActivityMixin, SetOfPropertiesMixin,
+    ThumbnailsMixin, TimestampedModelMixin, TrackedFieldsMixin
+)
 from . import managers
 
 
@@ -157,7 +160,10 @@ class WordingValue(models.Model):
         return self.name
 
 
-class Discussion(LastActivityMixin,
+class Discussion(TrackedFieldsMixin,
+                 ImageMetadataMixin,
+                 ThumbnailsMixin,
+                 LastActivityMixin,
                  TimestampedModelMixin,
                  models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -173,6 +179,10 @@ class Discussion(LastActivityMixin,
     has_replies = models.BooleanField(default=True)
     multiple_statements_allowed = models.BooleanField(default=False)
     user_can_add_replies = models.BooleanField(default=False)
+    buffered_votes = models.BooleanField(
+        _("Buffered votes"), default=False,
+        help_text=_("Collect barometer votes and apply them in batches. "
+                    "Only needed for polls with very high traffic."))
 
     barometer_wording = models.ForeignKey(
         Wording, verbose_name=_("Wording"), null=True, blank=True, on_delete=models.CASCADE)
@@ -188,6 +198,8 @@ class Discussion(LastActivityMixin,
 
     objects = managers.DiscussionQuerySet.as_manager()
 
+    tracked_fields = ('source_url', 'image', 'buffered_votes')
+
     @property
     def statement_count(self):
         if self.multiple_statements_allowed:
@@ -217,6 +229,9 @@ class Discussion(LastActivityMixin,
             self.source_url = self.source_url.split('#')[0]
         super().save(*args, **kwargs)
 
+    def image_source_changed(self):
+        return self.tracked_field_changed('source_url') or self.tracked_field_changed('image')
+
 
 class DiscussionList(TimestampedModelMixin, models.Model):
     SEARCH_BY_SHOW_ALL = 1
@@ -237,7 +252,11 @@ class DiscussionList(TimestampedModelMixin, models.Model):
         return self.name
 
 
-class Statement(LastActivityMixin,
+class Statement(TrackedFieldsMixin,
+                DenormalizedFieldsMixin,
+                ImageMetadataMixin,
+                ThumbnailsMixin,
+                LastActivityMixin,
                 TimestampedModelMixin,
                 models.Model):
     STATUS_ACTIVE = 1
@@ -246,6 +265,16 @@ class Statement(LastActivityMixin,
         (STATUS_ACTIVE, _("Active")),
         (STATUS_HIDDEN, _("Hidden"))
     )
+    BAROMETER_VALUES = (-3, -2, -1, 0, 1, 2, 3)
+    BAROMETER_HISTOGRAM_FIELDS = (
+        'barometer_count_minus_3', 'barometer_count_minus_2', 'barometer_count_minus_1',
+        'barometer_count_0',
+        'barometer_count_plus_1', 'barometer_count_plus_2', 'barometer_count_plus_3',
+    )
+    # maintained by `utils.barometer`
+    denormalized_fields = (
+        'barometer_count', 'barometer_sum', 'barometer_value',
+    ) + BAROMETER_HISTOGRAM_FIELDS
     discussion = models.ForeignKey(Discussion, related_name='statements', on_delete=models.CASCADE)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     statement = models.CharField(max_length=1024, blank=True)
@@ -257,13 +286,26 @@ class Statement(LastActivityMixin,
     barometer_count = models.PositiveIntegerField(default=0, editable=False)
     barometer_value = models.DecimalField(decimal_places=1, max_digits=2,
                                           default=0, editable=False)
+    barometer_sum = models.IntegerField(default=0, editable=False)
+    # number of votes per value, see `barometer_histogram`
+    barometer_count_minus_3 = models.PositiveIntegerField(default=0, editable=False)
+    barometer_count_minus_2 = models.PositiveIntegerField(default=0, editable=False)
+    barometer_count_minus_1 = models.PositiveIntegerField(default=0, editable=False)
+    barometer_count_0 = models.PositiveIntegerField(default=0, editable=False)
+    barometer_count_plus_1 = models.PositiveIntegerField(default=0, editable=False)
+    barometer_count_plus_2 = models.PositiveIntegerField(default=0, editable=False)
+    barometer_count_plus_3 = models.PositiveIntegerField(default=0, editable=False)
 
     image = models.ImageField(_("Image"), null=True, blank=True, upload_to='images/statements/')
     video = EmbedVideoField(_("Video"), null=True, blank=True)
+    # the video's or the preview of the image
     thumbnail = models.URLField(null=True, blank=True)
 
     objects = managers.StatementQuerySet.as_manager()
 
+    tracked_fields = ('image',)
+    thumbnail_fields = ('thumbnails', 'thumbnail')
+
     @property
     def has_barometer(self):
         return self.discussion.has_barometer
@@ -284,6 +326,22 @@ class Statement(LastActivityMixin,
     def customer(self):
         return self.discussion.customer
 
+    @property
+    def barometer_histogram(self):
+        return {
+            value: getattr(self, self.barometer_count_field(value))
+            for value in self.BAROMETER_VALUES
+        }
+
+    @classmethod
+    def barometer_count_field(cls, value):
+        return cls.BAROMETER_HISTOGRAM_FIELDS[cls.BAROMETER_VALUES.index(value)]
+
+    def set_thumbnails(self, urls):
+        super().set_thumbnails(urls)
+        if not self.video:
+            self.thumbnail = urls.get('preview', '')
+
     def __str__(self):
         return self.statement
 
@@ -294,17 +352,21 @@ class Statement(LastActivityMixin,
         super().save(*args, **kwargs)
 
 
-class BarometerVote(TimestampedModelMixin, models.Model):
+class BarometerVote(TrackedFieldsMixin, TimestampedModelMixin, models.Model):
     statement = models.ForeignKey(
         Statement, related_name='barometer_votes', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     value = models.IntegerField(choices=WordingValue.CHOICES)
 
+    tracked_fields = ('value',)
+
     class Meta:
         unique_together = ('statement', 'user')
 
 
-class Argument(LastActivityMixin,
+class Argument(TrackedFieldsMixin,
+               DenormalizedFieldsMixin,
+               LastActivityMixin,
                TimestampedModelMixin,
                models.Model):
 
@@ -346,9 +408,18 @@ class Argument(LastActivityMixin,
     original_rating_count_of_hidden_argument = models.PositiveIntegerField(
         default=0, editable=False
     )
+    rating_sum = models.DecimalField(
+        decimal_places=1, max_digits=10, editable=False, default=0)
 
     objects = managers.ArgumentQuerySet.as_manager()
 
+    tracked_fields = ('status',)
+    # maintained by `utils.rating`
+    denormalized_fields = (
+        'rating_value', 'rating_count', 'rating_sum',
+        'original_rating_of_hidden_argument', 'original_rating_count_of_hidden_argument',
+    )
+
     @property
     def reply_count(self):
         return self.replies.visible().count()
@@ -362,12 +433,14 @@ class Argument(LastActivityMixin,
         return self.statement.discussion
 
 
-class Rating(TimestampedModelMixin, models.Model):
+class Rating(TrackedFieldsMixin, TimestampedModelMixin, models.Model):
     argument = models.ForeignKey(
         Argument, related_name='ratings', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     value = models.DecimalField(decimal_places=1, max_digits=2, editable=False)
 
+    tracked_fields = ('value',)
+
     class Meta:
         unique_together = ('argument', 'user')
 
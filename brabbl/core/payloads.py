@@ -0,0 +1,76 @@
+"""
+Cache of the rendered discussion payload served to every user, see
+`DiscussionViewSet.shared`.
+
+Payloads are keyed by customer, external id, language and a version per
+discussion. Any change of a discussion's activity bumps its version, see
+`brabbl.utils.activity`, so outdated payloads are never read again and
+simply expire. Data shown in discussions but stored outside of them,
+tags, wordings and user names, is covered by a version per customer.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import translation
+
+from brabbl.utils.versions import bump_version, get_version
+
+
+def get_discussion_version_key(discussion_id):
+    return 'brabbl:discussion-version:{}'.format(discussion_id)
+
+
+def get_customer_discussions_version_key(customer_id):
+    # changes of a customer's discussions which don't show up in their activity
+    return 'brabbl:customer-discussions-version:{}'.format(customer_id)
+
+
+def invalidate_discussions(discussion_ids, customer_ids=()):
+    keys = [get_discussion_version_key(discussion_id) for discussion_id in discussion_ids]
+    keys += [get_customer_discussions_version_key(customer_id) for customer_id in customer_ids]
+
+    def bump():
+        for key in keys:
+            bump_version(key)
+
+    bump()
+    # requests may render the old state until the transaction commits
+    transaction.on_commit(bump)
+
+
+def get_content_version_key(customer_id):
+    # `None` for the wordings of all customers
+    return 'brabbl:content-version:{}'.format(customer_id)
+
+
+def invalidate_content(customer_id):
+    key = get_content_version_key(customer_id)
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def get_content_versions(customer):
+    return (get_version(get_content_version_key(customer.pk)),
+            get_version(get_content_version_key(None)))
+
+
+def get_payload_key(customer, discussion_id, external_id):
+    parts = [customer.pk, customer.modified_at, external_id, translation.get_language(),
+             get_version(get_discussion_version_key(discussion_id)),
+             get_content_versions(customer)]
+    # external ids may contain characters memcached does not accept
+    return 'brabbl:discussion-payload:{}'.format(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def get_shared_payload(customer, discussion_id, external_id, render):
+    """
+    The cached payload of the discussion, `render()` builds it on a miss.
+    """
+    key = get_payload_key(customer, discussion_id, external_id)
+    content = cache.get(key)
+    if content is None:
+        content = render()
+        cache.set(key, content, settings.DISCUSSION_CACHE_TIMEOUT)
+    return content
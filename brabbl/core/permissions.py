@@ -1,6 +1,7 @@
-from brabbl.utils.models import delete_all_unexpired_sessions_for_user
+from brabbl.accounts.sessions import delete_all_unexpired_sessions_for_user
 from django.contrib.auth import logout
 from rest_framework.permissions import DjangoObjectPermissions, BasePermission
+from rest_framework.request import clone_request
 
 from django.utils.translation import ugettext_lazy as _
 
@@ -26,12 +27,19 @@ class BrabblDjangoObjectPermission(DjangoObjectPermissions):
         method = method.upper()
         return super().get_required_object_permissions(method, model_cls)
 
+    def has_model_permission(self, request, view):
+        return super().has_permission(request, view)
+
 
 class StaffOnlyWritePermission(BrabblDjangoObjectPermission):
     message = _("Object must be created or modified only by an administrator.")
 
     def has_object_permission(self, request, view, obj):
-        return super().has_permission(request, view)
+        return self.derive_object_permission(
+            request, obj, self.has_model_permission(request, view))
+
+    def derive_object_permission(self, request, obj, has_model_permission):
+        return has_model_permission
 
 
 class ActivityBasedObjectPermission(BrabblDjangoObjectPermission):
@@ -41,7 +49,11 @@ class ActivityBasedObjectPermission(BrabblDjangoObjectPermission):
         return True
 
     def has_object_permission(self, request, view, obj):
-        return super().has_permission(request, view) or obj.last_related_activity is None
+        return self.derive_object_permission(
+            request, obj, self.has_model_permission(request, view))
+
+    def derive_object_permission(self, request, obj, has_model_permission):
+        return has_model_permission or obj.last_related_activity is None
 
 
 class OwnershipObjectPermission(BrabblDjangoObjectPermission):
@@ -51,4 +63,47 @@ class OwnershipObjectPermission(BrabblDjangoObjectPermission):
         return True
 
     def has_object_permission(self, request, view, obj):
-        return super().has_permission(request, view) or obj.created_by == request.user
+        return self.derive_object_permission(
+            request, obj, self.has_model_permission(request, view))
+
+    def derive_object_permission(self, request, obj, has_model_permission):
+        return has_model_permission or obj.created_by_id == request.user.pk
+
+
+class PermissionResolver(object):
+    """
+    Answers `view.check_object_permissions` for many objects of a request.
+
+    The model permissions of the user are evaluated once per method.
+    Permissions providing `derive_object_permission` then only look at
+    the object itself, all others are checked as usual.
+    """
+
+    def __init__(self, view, request):
+        self.view = view
+        self.request = request
+        self._checks = {}
+
+    def get_checks(self, method):
+        if method not in self._checks:
+            request = clone_request(self.request, method)
+            checks = []
+            for permission in self.view.get_permissions():
+                if hasattr(permission, 'derive_object_permission'):
+                    checks.append(
+                        (permission, permission.has_model_permission(request, self.view)))
+                else:
+                    checks.append((permission, None))
+            self._checks[method] = (request, checks)
+        return self._checks[method]
+
+    def has_object_permission(self, obj, method):
+        request, checks = self.get_checks(method)
+        for permission, has_model_permission in checks:
+            if has_model_permission is None:
+                allowed = permission.has_object_permission(request, self.view, obj)
+            else:
+                allowed = permission.derive_object_permission(request, obj, has_model_permission)
+            if not allowed:
+                return False
+        return True
@@ -5,7 +5,6 @@ from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 
 from brabbl.accounts.models import Customer, CustomerUserInfoSettings
-from brabbl.utils.models import get_thumbnail_url
 from brabbl.utils.serializers import (
     Base64ImageField, NonNullSerializerMixin, PermissionSerializerMixin
 )
@@ -108,6 +107,11 @@ class ArgumentRatingSerializer(NonNullSerializerMixin, serializers.ModelSerializ
         read_only_fields = ('count', 'rating', 'user_rating')
 
     def get_user_rating(self, obj):
+        # preloaded by `loaders.UserOverlay.for_discussion`
+        overlay = self.context.get('overlay')
+        if overlay is not None:
+            return overlay.rating_for(obj)
+
         user = self.context['request'].user
         if user.is_anonymous:
             return None
@@ -129,6 +133,7 @@ class ArgumentSerializer(PermissionSerializerMixin, serializers.ModelSerializer)
         required=False,
         queryset=models.Argument.objects.visible())
     rating = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
 
     class Meta:
         model = models.Argument
@@ -152,6 +157,9 @@ class ArgumentSerializer(PermissionSerializerMixin, serializers.ModelSerializer)
         return ArgumentRatingSerializer(obj, context=self.context).data
 
     def get_reply_count(self, obj):
+        # preloaded by `loaders.load_statement_tree`
+        if hasattr(obj, 'visible_reply_count'):
+            return obj.visible_reply_count
         return obj.replies.visible().count()
 
     def validate_reply_to(self, reply_to):
@@ -218,6 +226,11 @@ class BarometerSerializer(NonNullSerializerMixin, serializers.ModelSerializer):
         )
 
     def get_user_rating(self, obj):
+        # preloaded by `loaders.UserOverlay.for_discussion`
+        overlay = self.context.get('overlay')
+        if overlay is not None:
+            return overlay.vote_for(obj)
+
         user = self.context['request'].user
         if user.is_anonymous:
             return None
@@ -229,10 +242,7 @@ class BarometerSerializer(NonNullSerializerMixin, serializers.ModelSerializer):
         return rating.value
 
     def get_count_ratings(self, obj):
-        ratings = list(obj.barometer_votes.order_by('value').values_list(
-            'value', flat=True
-        ))
-        return {value: ratings.count(value) for value in range(-3, 4)}
+        return obj.barometer_histogram
 
 
 class StatementSerializer(NonNullSerializerMixin,
@@ -254,7 +264,10 @@ class StatementSerializer(NonNullSerializerMixin,
                             'arguments', 'barometer')
 
     def get_arguments(self, statement):
-        arguments = statement.arguments.visible().without_replies()
+        # preloaded by `loaders.load_statement_tree`
+        arguments = getattr(statement, 'visible_arguments', None)
+        if arguments is None:
+            arguments = statement.arguments.visible().without_replies()
         serializer = ArgumentSerializer(arguments, many=True, context=self.context)
         return serializer.data
 
@@ -293,6 +306,9 @@ class StatementSerializer(NonNullSerializerMixin,
         ret = super().to_representation(instance)
         if 'video' in ret and ret['video']:
             ret['video'] = YoutubeBackend(ret['video']).get_code()
+        elif ret.get('thumbnail') == '' and instance.image:
+            # the original image until the preview is generated
+            ret['thumbnail'] = instance.thumbnail_url('preview')
         return ret
 
 
@@ -319,8 +335,9 @@ class BaseDiscussionSerializer(PermissionSerializerMixin, serializers.Serializer
 
     def get_image_url(self, discussion):
         url = discussion.image_url
-        if discussion.image and discussion.image.size > 2000:
-            url = get_thumbnail_url(discussion.image, {'size': (300, 200), 'crop': True})
+        # the size of images uploaded before the metadata was recorded is unknown
+        if discussion.image and (discussion.image_size is None or discussion.image_size > 2000):
+            url = discussion.thumbnail_url('preview')
         return url
 
 
@@ -381,7 +398,10 @@ class DiscussionSerializer(BaseDiscussionSerializer, serializers.ModelSerializer
         return fields
 
     def get_statements(self, discussion):
-        statements = discussion.statements.visible()
+        # preloaded by `loaders.load_discussion_tree`
+        statements = getattr(discussion, 'visible_statements', None)
+        if statements is None:
+            statements = discussion.statements.visible()
         serializer = StatementSerializer(statements, many=True, context=self.context)
         return serializer.data
 
@@ -442,6 +462,56 @@ class DiscussionSerializer(BaseDiscussionSerializer, serializers.ModelSerializer
         return discussion
 
 
+class StatementOverlaySerializer(NonNullSerializerMixin,
+                                 PermissionSerializerMixin,
+                                 serializers.ModelSerializer):
+    user_rating = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.Statement
+        fields = ('user_rating', 'is_editable', 'is_deletable')
+
+    def get_user_rating(self, statement):
+        return self.context['overlay'].vote_for(statement)
+
+
+class ArgumentOverlaySerializer(NonNullSerializerMixin,
+                                PermissionSerializerMixin,
+                                serializers.ModelSerializer):
+    user_rating = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.Argument
+        fields = ('user_rating', 'is_editable', 'is_deletable')
+
+    def get_user_rating(self, argument):
+        return self.context['overlay'].rating_for(argument)
+
+
+class DiscussionOverlaySerializer(PermissionSerializerMixin, serializers.ModelSerializer):
+    """
+    The viewer specific part of `DiscussionSerializer`, keyed by object id.
+    """
+    statements = serializers.SerializerMethodField()
+    arguments = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.Discussion
+        fields = ('is_editable', 'is_deletable', 'statements', 'arguments')
+
+    def get_statements(self, discussion):
+        return {
+            statement.pk: StatementOverlaySerializer(statement, context=self.context).data
+            for statement in discussion.visible_statements
+        }
+
+    def get_arguments(self, discussion):
+        return {
+            argument.pk: ArgumentOverlaySerializer(argument, context=self.context).data
+            for argument in discussion.visible_arguments
+        }
+
+
 class UpdateDiscussionSerializer(serializers.ModelSerializer):
     url = serializers.URLField(source='source_url')
     tags = TagListField()
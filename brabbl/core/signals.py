@@ -1,75 +1,118 @@
-import os
-import signal
 from embed_video.backends import YoutubeBackend
 from rosetta.signals import post_save as rosetta_post_save
 
 from django.conf import settings
-from django.db.models import Avg
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.models.signals import pre_delete, pre_save, post_delete, post_save
 from django.dispatch import receiver
 
-from brabbl.core import models, tasks
-from brabbl.utils import logger
-from brabbl.utils.rating import denormalize_argument_rating
-from brabbl.utils.models import get_thumbnail_url
+from brabbl.core import models, payloads, tasks
+from brabbl.utils import activity, barometer, language_utils, logger, rating, vote_buffer
 
 
 @receiver(post_save, sender=models.BarometerVote)
-def denorm_barometer_values(sender, instance, **kwargs):
-    statement = instance.statement
-    votes = statement.barometer_votes.all()
-    total = votes.count()
-    avg = votes.aggregate(Avg('value'))['value__avg']
-
-    statement.barometer_count = total
-    statement.barometer_value = avg
-    statement.save()
+def denorm_barometer_values(sender, instance, created, **kwargs):
+    if created:
+        barometer.update_barometer(instance.statement_id, new_value=instance.value)
+        return
 
+    old_value = instance.get_loaded_value('value')
+    if old_value is None:
+        # the previous value is unknown, recount this statement
+        barometer.rebuild_barometers(
+            models.Statement.objects.filter(pk=instance.statement_id))
+    else:
+        barometer.update_barometer(
+            instance.statement_id, old_value=old_value, new_value=instance.value)
+
+
+@receiver(post_delete, sender=models.BarometerVote)
+def denorm_barometer_values_on_delete(sender, instance, **kwargs):
+    barometer.update_barometer(
+        instance.statement_id,
+        old_value=instance.get_loaded_value('value', instance.value))
+
+
+@receiver(post_save, sender=models.Argument)
+def denorm_rating_values_for_argument(sender, instance, created, **kwargs):
+    if created:
+        old_status = models.Argument.STATUS_ACTIVE
+    else:
+        old_status = instance.get_loaded_value('status', instance.status)
+    if old_status == instance.status:
+        return
 
-@receiver(pre_save, sender=models.Argument)
-def denorm_rating_values_for_argument(sender, instance, **kwargs):
     if instance.status == models.Argument.STATUS_HIDDEN:
-        instance.original_rating_of_hidden_argument = instance.rating_value
-        instance.original_rating_count_of_hidden_argument = instance.rating_count
-        instance.rating_count = 0
-        instance.rating_value = 0
-    elif not instance.rating_count and not instance.rating_value:
-        instance.rating_count = instance.original_rating_count_of_hidden_argument
-        instance.rating_value = instance.original_rating_of_hidden_argument
+        rating.hide_argument_rating(instance)
+    else:
+        rating.restore_argument_rating(instance)
 
 
 @receiver(post_save, sender=models.Rating)
-def denorm_rating_values(sender, instance, **kwargs):
-    denormalize_argument_rating(instance.argument)
+def denorm_rating_values(sender, instance, created, **kwargs):
+    if created:
+        rating.update_argument_rating(instance.argument_id, new_value=instance.value)
+        return
+
+    old_value = instance.get_loaded_value('value')
+    if old_value is None:
+        # the previous value is unknown, recount this argument
+        rating.rebuild_argument_ratings(
+            models.Argument.objects.filter(pk=instance.argument_id))
+    else:
+        rating.update_argument_rating(
+            instance.argument_id, old_value=old_value, new_value=instance.value)
 
 
-model_herachie = {
-    models.Rating: ['argument'],
-    models.Argument: ['reply_to',
-                      'statement'],
-    models.BarometerVote: ['statement'],
-    models.Statement: ['discussion'],
-}
+@receiver(post_delete, sender=models.Rating)
+def denorm_rating_values_on_delete(sender, instance, **kwargs):
+    rating.update_argument_rating(
+        instance.argument_id,
+        old_value=instance.get_loaded_value('value', instance.value))
 
 
 @receiver(post_save)
 def propagate_last_related_activity(sender, instance, **kwargs):
-    try:
-        fields = model_herachie[sender]
-    except KeyError:
-        return
+    activity.propagate_last_related_activity(instance)
+
+
+@receiver(post_save, sender=models.Discussion)
+def invalidate_discussion_payload(sender, instance, **kwargs):
+    payloads.invalidate_discussions([instance.pk])
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_delete, sender=models.Tag)
+@receiver(post_save, sender=models.Wording)
+@receiver(post_delete, sender=models.Wording)
+def invalidate_content(sender, instance, **kwargs):
+    payloads.invalidate_content(instance.customer_id)
 
-    new_datetime = instance.modified_at
 
-    for field in fields:
-        obj = getattr(instance, field)
-        if not obj:
-            continue
+@receiver(post_save, sender=models.WordingValue)
+@receiver(post_delete, sender=models.WordingValue)
+def invalidate_wording_value_content(sender, instance, **kwargs):
+    customer_id = models.Wording.objects.filter(
+        pk=instance.wording_id).values_list('customer_id', flat=True).first()
+    payloads.invalidate_content(customer_id)
 
-        if not obj.last_related_activity or obj.last_related_activity < new_datetime:
-            obj.last_related_activity = new_datetime
-            obj.save()
-        break
+
+@receiver(post_save, sender=models.User)
+def invalidate_user_content(sender, instance, created, **kwargs):
+    # the display name is shown next to the user's contributions
+    if any(instance.tracked_field_changed(field)
+           for field in ('username', 'first_name', 'last_name')):
+        payloads.invalidate_content(instance.customer_id)
+
+
+# per sender, a receiver for all models would prevent fast deletes
+@receiver(pre_delete, sender=models.Rating)
+@receiver(pre_delete, sender=models.Argument)
+@receiver(pre_delete, sender=models.BarometerVote)
+@receiver(pre_delete, sender=models.Statement)
+def invalidate_deleted(sender, instance, **kwargs):
+    # before the delete, so the discussions can still be found
+    activity.invalidate_deleted(instance)
 
 
 @receiver(post_save, sender=models.Flag)
@@ -89,9 +132,11 @@ def flagging_notification(sender, instance, **kwargs):
 
 
 @receiver(post_save, sender=models.Discussion)
-def download_image(sender, instance, **kwargs):
-    if not getattr(settings, 'TESTING', False):
-        tasks.get_discussion_image(instance)
+def download_image(sender, instance, created, **kwargs):
+    changed = (instance.source_url or instance.image) if created else instance.image_source_changed()
+    if changed and not getattr(settings, 'TESTING', False):
+        # the worker has to see the saved discussion
+        transaction.on_commit(lambda: tasks.enqueue_discussion_image(instance))
 
     if instance.external_id is None or instance.external_id == '-':
         instance.external_id = str(instance.id)
@@ -100,11 +145,9 @@ def download_image(sender, instance, **kwargs):
 
 @receiver(rosetta_post_save)
 def reload_for_rosetta(**kwargs):
-    pidfile = getattr(settings, 'GUNICORN_PID_FILE', None)
-    if pidfile and os.path.exists(pidfile):
-        pid = int(open(pidfile).read().strip())
-        logger.info('Reloading gunicorn for PO files, PID %s', pid)
-        os.kill(pid, signal.SIGHUP)
+    # every worker reloads its catalogs on its next request, see
+    # `TranslationReloadMiddleware`
+    language_utils.invalidate_translations()
 
 
 @receiver(pre_save, sender=models.Statement)
@@ -123,12 +166,35 @@ def image_video_xor_add(sender, instance, *args, **kwargs):
     elif instance.thumbnail and not bool(instance.image.name):
         instance.thumbnail = ''
     elif instance.image and not old_data or (old_data and (
-            not bool(old_data.image.name) or instance.image.size != old_data.image.size)):
+            not bool(old_data.image.name) or instance.image.name != old_data.image.name)):
         instance.thumbnail = ''
 
 
+@receiver(pre_save, sender=models.Statement)
+@receiver(pre_save, sender=models.Discussion)
+@receiver(pre_save, sender=models.User)
+def image_changed(sender, instance, **kwargs):
+    if instance._state.adding or instance.tracked_field_changed('image'):
+        instance.update_image_metadata()
+    if instance.tracked_field_changed('image'):
+        # never show the thumbnails of a replaced image
+        instance.set_thumbnails({})
+
+
 @receiver(post_save, sender=models.Statement)
-def image_thumbnail(sender, instance, **kwargs):
-    if instance.image and instance.thumbnail == '':
-        instance.thumbnail = get_thumbnail_url(instance.image, {'size': (100, 70), 'crop': True})
-        instance.save()
+@receiver(post_save, sender=models.Discussion)
+@receiver(post_save, sender=models.User)
+def generate_thumbnails(sender, instance, created, **kwargs):
+    changed = created or instance.tracked_field_changed('image')
+    if changed and instance.image and not getattr(settings, 'TESTING', False):
+        transaction.on_commit(lambda: tasks.enqueue_thumbnails(instance))
+
+
+@receiver(post_save, sender=models.Discussion)
+def flush_unbuffered_votes(sender, instance, created, **kwargs):
+    # votes are cast directly from now on, leftover buffered ones would be
+    # hidden from their users and overwrite newer votes
+    if not instance.buffered_votes and instance.tracked_field_changed('buffered_votes'):
+        statement_ids = list(instance.statements.values_list('pk', flat=True))
+        transaction.on_commit(
+            lambda: vote_buffer.flush_buffered_votes(statement_ids, blocking=True))
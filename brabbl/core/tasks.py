@@ -1,33 +1,158 @@
-from django_rq import job
-import requests
+import hashlib
+import io
+import os
+
+from PIL import Image
+from django_rq import get_queue
+from easy_thumbnails.alias import aliases
 from requests import exceptions
+from rq.job import JobStatus
 from webpreview.excepts import WebpreviewException
 from webpreview.previews import web_preview
 
+from django.apps import apps
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
 
+from brabbl.core.models import Discussion
+from brabbl.utils.http import url_exists
+from brabbl.utils.models import get_thumbnail_url
 
-def image_exists(url):
-    exists = False
-    try:
-        exists = requests.get(url).status_code == 200
-    except (exceptions.MissingSchema, exceptions.ConnectionError):
-        pass
-    return exists
+# seconds until a job is killed
+IMAGE_JOB_TIMEOUT = 2 * 60
+THUMBNAILS_JOB_TIMEOUT = 5 * 60
+REQUEST_TIMEOUT = 10
+
+
+def get_image_job_id(discussion):
+    source_url = discussion.source_url or ''
+    return 'discussion-image:{}:{}'.format(
+        discussion.pk, hashlib.sha1(source_url.encode()).hexdigest())
+
+
+def enqueue_once(job_id, func, args, timeout):
+    """
+    Enqueue `func`, unless the job `job_id` is still pending.
+    """
+    queue = get_queue()
+    job = queue.fetch_job(job_id)
+    if job is not None and job.get_status() in (JobStatus.QUEUED, JobStatus.STARTED):
+        return job
+    return queue.enqueue_call(func, args=args, job_id=job_id, timeout=timeout)
 
 
-@job
-def get_discussion_image(discussion, force=False):
-    if (not discussion.image or discussion.image.size < 2000) and not image_exists(discussion.image_url):
+def enqueue_discussion_image(discussion):
+    """
+    Fetch the preview image of `discussion` in the background. A job
+    still pending for the same discussion and source url is reused.
+    """
+    return enqueue_once(
+        get_image_job_id(discussion), get_discussion_image, (discussion.pk,), IMAGE_JOB_TIMEOUT)
+
+
+def get_discussion_image(discussion_id):
+    try:
+        discussion = Discussion.objects.get(pk=discussion_id)
+    except Discussion.DoesNotExist:
+        return
+
+    small_image = discussion.image_size is not None and discussion.image_size < 2000
+    if (not discussion.image or small_image) and \
+            not url_exists(discussion.image_url):
         try:
-            title, description, url = web_preview(discussion.source_url)
-        except WebpreviewException:
+            title, description, url = web_preview(discussion.source_url, timeout=REQUEST_TIMEOUT)
+        except (WebpreviewException, exceptions.RequestException):
             url = None
         else:
-            if not url or not image_exists(url):
+            if not url or not url_exists(url):
                 protocol = "https" if settings.SESSION_COOKIE_SECURE else "http"
                 url = "{}://{}/static/img/placeholder.png".format(
                     protocol, settings.SITE_DOMAIN
                 )
             discussion.image_url = url
-            discussion.save()
+            # leave concurrent changes of other fields alone
+            discussion.save(update_fields=['image_url', 'modified_at'])
+
+
+def get_thumbnails_job_id(instance):
+    return 'thumbnails:{}:{}:{}'.format(
+        instance._meta.label, instance.pk, hashlib.sha1(instance.image.name.encode()).hexdigest())
+
+
+def enqueue_thumbnails(instance):
+    """
+    Generate all thumbnails of `instance.image` in the background, see
+    `ThumbnailsMixin`.
+    """
+    return enqueue_once(
+        get_thumbnails_job_id(instance), generate_thumbnails,
+        (instance._meta.label, instance.pk, instance.image.name), THUMBNAILS_JOB_TIMEOUT)
+
+
+def save_if_image_unchanged(instance, image_name, update_fields):
+    """
+    Save `update_fields` of `instance` unless its image was replaced by
+    another one than `image_name` in the meantime. Returns if it was saved.
+    """
+    with transaction.atomic():
+        # the row lock holds concurrent uploads back until the write is committed
+        if not type(instance).objects.select_for_update().filter(
+                pk=instance.pk, image=image_name).exists():
+            return False
+        instance.save(update_fields=update_fields)
+    return True
+
+
+def downscale_image(instance, image_name):
+    """
+    Replace `instance.image` by a copy fitting into `IMAGE_MAX_DIMENSION`
+    and delete the original.
+    """
+    max_dimension = settings.IMAGE_MAX_DIMENSION
+    with instance.image.open('rb'):
+        image = Image.open(instance.image)
+        image_format = image.format
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    content = io.BytesIO()
+    image.save(content, format=image_format)
+
+    storage = instance.image.storage
+    instance.image.save(os.path.basename(image_name), ContentFile(content.getvalue()), save=False)
+    update_fields = ['image']
+    update_fields.extend(instance.image_metadata_fields)
+    update_fields.extend(instance.thumbnail_fields)
+    if hasattr(instance, 'modified_at'):
+        update_fields.append('modified_at')
+    # the thumbnails of the copy are generated by the job enqueued on save
+    if save_if_image_unchanged(instance, image_name, update_fields):
+        transaction.on_commit(lambda: storage.delete(image_name))
+    else:
+        storage.delete(instance.image.name)
+
+
+def generate_thumbnails(model_label, pk, image_name):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    # the image was replaced or removed in the meantime
+    if instance is None or instance.image.name != image_name:
+        return
+
+    update_fields = []
+    if instance.image_size is None:
+        # uploaded before the metadata was recorded
+        instance.update_image_metadata()
+        update_fields.extend(instance.image_metadata_fields)
+    if max(instance.image_width or 0, instance.image_height or 0) > settings.IMAGE_MAX_DIMENSION:
+        downscale_image(instance, image_name)
+        return
+
+    instance.set_thumbnails({
+        alias: get_thumbnail_url(instance.image, options)
+        for alias, options in aliases.all(target=instance.image).items()
+    })
+    update_fields.extend(instance.thumbnail_fields)
+    if hasattr(instance, 'modified_at'):
+        update_fields.append('modified_at')
+    # rendering takes a while, the image may have been replaced since it was loaded
+    save_if_image_unchanged(instance, image_name, update_fields)
@@ -2,7 +2,6 @@ from django import template
 from urllib.parse import urlparse
 
 from brabbl.utils import http
-from brabbl.utils.models import get_thumbnail_url
 
 register = template.Library()
 
@@ -13,12 +12,10 @@ def build_absolute_url(url):
 
 
 @register.simple_tag
-def get_thumbnail(image, resolution='48x48'):
-    width, height = map(int, resolution.split('x'))
+def get_thumbnail(image, alias='avatar'):
     if not image:
         return ''
-    options = {'size': (width, height), 'crop': True}
-    return "<img src='{}' />".format(get_thumbnail_url(image, options))
+    return "<img src='{}' />".format(image.instance.thumbnail_url(alias))
 
 
 @register.filter
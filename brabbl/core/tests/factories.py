@@ -1,9 +1,22 @@
+import io
+import os
+
 import factory
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 from brabbl.accounts.tests.factories import CustomerFactory, UserFactory
 from .. import models
 
 
+def make_image(name='image.png', size=(400, 300)):
+    content = io.BytesIO()
+    # noise, so the file is not compressed to a few bytes
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), content_type='image/png')
+
+
 class TagFactory(factory.django.DjangoModelFactory):
     name = factory.Sequence(lambda n: 'Tag %d' % n)
 
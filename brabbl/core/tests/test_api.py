@@ -1,12 +1,21 @@
 import json
+from unittest import mock
+
+import fakeredis
 from django.core import mail
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import translation
 from django.utils.timezone import now
 from rest_framework import status
+from rosetta.signals import post_save as rosetta_post_save
 
 from brabbl.accounts.tests.factories import add_staff_permissions_to_user
-from brabbl.utils import test
-from .. import models
+from brabbl.utils import language_utils, test, vote_buffer
+from brabbl.utils.http import build_absolute_url
+from .. import models, payloads, tasks
 from . import factories
 
 
@@ -320,12 +329,249 @@ class DiscussionAPITest(test.ViewSetTestMixin,
             2, discussion=discussion)
 
         response = self.retrieve(obj=discussion)
-        self.assertEqual(len(response.data['statements']), 2)
+        self.assertEqual(len(response.json()['statements']), 2)
 
         statement2.delete()
         response = self.retrieve(obj=discussion)
-        self.assertEqual(len(response.data['statements']), 1)
-        self.assertEqual(response.data['statements'][0]['id'], statement1.id)
+        self.assertEqual(len(response.json()['statements']), 1)
+        self.assertEqual(response.json()['statements'][0]['id'], statement1.id)
+
+    def create_discussions(self, *sizes):
+        # create all statements first, `StatementFactory` adopts existing arguments
+        discussions = []
+        for statement_count, argument_count in sizes:
+            discussion = factories.ComplexDiscussionFactory.create(
+                customer=self.customer, barometer_wording=self.wording)
+            statements = factories.StatementFactory.create_batch(
+                statement_count, discussion=discussion, created_by=self.user)
+            discussions.append((discussion, statements, argument_count))
+
+        for discussion, statements, argument_count in discussions:
+            for statement in statements:
+                models.BarometerVote.objects.create(
+                    statement=statement, user=self.user, value=1)
+                arguments = factories.ArgumentFactory.create_batch(
+                    argument_count, statement=statement, created_by=self.user)
+                for argument in arguments:
+                    factories.ArgumentFactory.create(
+                        statement=statement, reply_to=argument, created_by=self.user)
+        return [discussion for discussion, __, __ in discussions]
+
+    def test_retrieve_query_count_is_constant(self):
+        small, large = self.create_discussions((1, 1), (4, 5))
+        # the first request loads the customer into the tenant cache
+        self.retrieve(obj=small)
+        # render both payloads, not the cached ones
+        payloads.invalidate_discussions([small.pk, large.pk])
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.retrieve(obj=small)
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.retrieve(obj=large)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(len(response.json()['statements']), 4)
+        for statement in response.json()['statements']:
+            self.assertEqual(len(statement['arguments']), 5)
+            self.assertEqual(statement['barometer']['count_ratings']['1'], 1)
+            for argument in statement['arguments']:
+                self.assertEqual(argument['reply_count'], 1)
+
+    def test_retrieve_query_count_is_constant_for_user(self):
+        small, large = self.create_discussions((1, 1), (4, 5))
+        for argument in models.Argument.objects.without_replies():
+            models.Rating.objects.create(argument=argument, user=self.user, value=4)
+        self.client.as_user(self.user)
+        # the first request loads the customer and creates the auth token
+        self.retrieve(obj=small)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.retrieve(obj=small)
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.retrieve(obj=large)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+        for statement in response.data['statements']:
+            self.assertEqual(statement['barometer']['user_rating'], 1)
+            for argument in statement['arguments']:
+                self.assertEqual(argument['rating']['user_rating'], 4)
+
+    def test_shared_payload_cached(self):
+        discussion, = self.create_discussions((2, 1))
+        url = '/api/v1/discussions/shared/?external_id=%s' % discussion.external_id
+        self.client.as_customer(self.customer)
+        content = self.client.get(url).content
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).content, content)
+
+        # every change of the discussion outdates the payload
+        statement = models.Statement.objects.first()
+        models.BarometerVote.objects.create(
+            statement=statement, user=factories.UserFactory.create(), value=-3)
+        statements = {item['id']: item for item in self.client.get(url).json()['statements']}
+        self.assertEqual(statements[statement.pk]['barometer']['count'], 2)
+
+    def test_shared_payload_per_language(self):
+        discussion, = self.create_discussions((1, 1))
+        key = payloads.get_payload_key(self.customer, discussion.pk, discussion.external_id)
+        with translation.override('de'):
+            self.assertNotEqual(
+                payloads.get_payload_key(self.customer, discussion.pk, discussion.external_id), key)
+
+    def test_shared_has_no_user_fields(self):
+        discussion, = self.create_discussions((2, 1))
+        add_staff_permissions_to_user(self.user)
+        self.client.as_customer(self.customer)
+        self.client.as_user(self.user)
+
+        response = self.client.get(
+            '/api/v1/discussions/shared/?external_id=%s' % discussion.external_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['is_editable'], False)
+        self.assertEqual(len(response.json()['statements']), 2)
+        for statement in response.json()['statements']:
+            self.assertEqual(statement['is_editable'], False)
+            self.assertNotIn('user_rating', statement['barometer'])
+            for argument in statement['arguments']:
+                self.assertEqual(argument['is_deletable'], False)
+                self.assertNotIn('user_rating', argument['rating'])
+
+    def test_overlay(self):
+        discussion, = self.create_discussions((2, 1))
+        argument = models.Argument.objects.without_replies().first()
+        models.Rating.objects.create(argument=argument, user=self.user, value=2)
+        add_staff_permissions_to_user(self.user)
+        self.client.as_customer(self.customer)
+        self.client.as_user(self.user)
+
+        response = self.client.get(
+            '/api/v1/discussions/overlay/?external_id=%s' % discussion.external_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['is_editable'], True)
+        self.assertEqual(len(response.data['statements']), 2)
+        for statement in response.data['statements'].values():
+            self.assertEqual(statement, {
+                'user_rating': 1, 'is_editable': True, 'is_deletable': True})
+        self.assertEqual(len(response.data['arguments']), 2)
+        self.assertEqual(response.data['arguments'][argument.pk]['user_rating'], 2)
+
+    def test_overlay_anonymous(self):
+        discussion, = self.create_discussions((1, 1))
+        self.client.as_customer(self.customer)
+
+        response = self.client.get(
+            '/api/v1/discussions/overlay/?external_id=%s' % discussion.external_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['is_editable'], False)
+        for argument in response.data['arguments'].values():
+            self.assertEqual(argument, {'is_editable': False, 'is_deletable': False})
+
+    def test_list_without_storage_access(self):
+        for i in range(3):
+            discussion = factories.SimpleDiscussionFactory.create(
+                customer=self.customer, image=factories.make_image(size=(400, 300)))
+            tasks.generate_thumbnails('core.Discussion', discussion.pk, discussion.image.name)
+
+        with mock.patch.object(FileSystemStorage, 'size', side_effect=AssertionError), \
+                mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError), \
+                mock.patch.object(FileSystemStorage, '_open', side_effect=AssertionError):
+            response = self.get_list()
+        self.assertEqual(len(response.data), 3)
+        for discussion in response.data:
+            self.assertIn('300x200', discussion['image_url'])
+
+    def test_list_image_without_metadata(self):
+        discussion = factories.SimpleDiscussionFactory.create(
+            customer=self.customer, image=factories.make_image(size=(400, 300)))
+        models.Discussion.objects.filter(pk=discussion.pk).update(image_size=None)
+
+        response = self.get_list()
+        self.assertEqual(response.data[0]['image_url'], build_absolute_url(discussion.image.url))
+
+    def test_retrieve_not_modified(self):
+        discussion, = self.create_discussions((1, 1))
+        url = self.get_retrieve_url(discussion)
+        response = self.retrieve(discussion)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        # the date can't tell about changes outside of the discussion
+        self.assertNotIn('Last-Modified', response)
+
+    def test_retrieve_modified(self):
+        discussion, = self.create_discussions((1, 1))
+        url = self.get_retrieve_url(discussion)
+        etag = self.retrieve(discussion)['ETag']
+
+        argument = models.Argument.objects.without_replies().get()
+        factories.ArgumentFactory.create(statement=argument.statement, reply_to=argument)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # deletes leave the activity alone but change the version
+        etag = response['ETag']
+        argument.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['statements'][0]['arguments']), 0)
+
+    def test_retrieve_modified_content(self):
+        discussion, = self.create_discussions((1, 1))
+        url = self.get_retrieve_url(discussion)
+        etag = self.retrieve(discussion)['ETag']
+
+        user = models.Argument.objects.without_replies().get().created_by
+        user.first_name = user.last_name = user.username = 'Renamed'
+        user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['statements'][0]['arguments'][0]['created_by'],
+                         user.display_name)
+
+        etag = response['ETag']
+        factories.WordingFactory.create()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_not_modified_per_user(self):
+        discussion, = self.create_discussions((1, 1))
+        url = self.get_retrieve_url(discussion)
+        anonymous_etag = self.retrieve(discussion)['ETag']
+
+        self.client.as_user(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # the edit rights depend on the permissions
+        add_staff_permissions_to_user(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_overlay_modified_by_buffered_vote(self):
+        discussion, = self.create_discussions((1, 0))
+        url = '/api/v1/discussions/overlay/?external_id=%s' % discussion.external_id
+        self.client.as_customer(self.customer)
+        self.client.as_user(self.user)
+        etag = self.client.get(url)['ETag']
+
+        with mock.patch.object(vote_buffer, 'get_redis', return_value=fakeredis.FakeStrictRedis()):
+            vote_buffer.get_redis().flushall()
+            vote_buffer.buffer_vote(models.Statement.objects.get(), self.user, 3)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
 class StatementAPITest(test.ViewSetTestMixin,
@@ -366,6 +612,16 @@ class StatementAPITest(test.ViewSetTestMixin,
         self.assertEqual(self.discussion.statements.all().count(), 1)
         self.assertEqual(response.data['created_by'], self.user.username)
 
+    def test_thumbnail(self):
+        statement = factories.StatementFactory.create(
+            discussion=self.discussion, created_by=self.user, image=factories.make_image())
+        response = self.retrieve(statement)
+        self.assertEqual(response.data['thumbnail'], build_absolute_url(statement.image.url))
+
+        tasks.generate_thumbnails('core.Statement', statement.pk, statement.image.name)
+        response = self.retrieve(statement)
+        self.assertIn('100x70', response.data['thumbnail'])
+
     def test_multiple_statements_allowed(self):
         # create first statement
         self.create()
@@ -494,6 +750,25 @@ class StatementAPITest(test.ViewSetTestMixin,
         self.assertEqual(len(response.data['arguments']), 1)
         self.assertEqual(response.data['arguments'][0]['id'], argument1.id)
 
+    def test_list_not_modified(self):
+        self.get_object()
+        etag = self.get_list()['ETag']
+        response = self.client.get(self.get_list_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other = factories.ComplexDiscussionFactory(
+            customer=self.customer, barometer_wording=self.wording)
+        factories.StatementFactory.create(discussion=other)
+        response = self.client.get(self.get_list_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        etag = response['ETag']
+        other.statements.get().delete()
+        response = self.client.get(self.get_list_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
 
 class StatementVoteAPITest(test.CreateTestMixin,
                            test.BrabblAPITestCase):
@@ -559,6 +834,20 @@ class StatementVoteAPITest(test.CreateTestMixin,
         self.discussion.save()
         self.create(data={'rating': 2}, status_code=status.HTTP_403_FORBIDDEN)
 
+    def test_buffered_vote(self):
+        self.discussion.buffered_votes = True
+        self.discussion.save()
+
+        with mock.patch.object(vote_buffer, 'get_redis', return_value=fakeredis.FakeStrictRedis()):
+            vote_buffer.get_redis().flushall()
+            response = self.create(data={'rating': -1})
+            self.assertEqual(response.data['count'], 0)
+            self.assertEqual(response.data['user_rating'], -1)
+            self.assertFalse(models.BarometerVote.objects.exists())
+
+            vote_buffer.flush_buffered_votes()
+        self.assertEqual(models.BarometerVote.objects.get().value, -1)
+
     def test_mean_and_count(self):
         self.create(data={'rating': 3}, as_user=factories.UserFactory.create())
         self.create(data={'rating': -2}, as_user=factories.UserFactory.create())
@@ -609,6 +898,32 @@ class ArgumentAPITest(test.ViewSetTestMixin,
         self.assertEqual(response.data['created_by'], self.user.username)
         self.assertEqual(response.data['rating']['rating'], 3)  # default value
 
+    def test_permission_flags_in_list(self):
+        own = self.get_object()
+        answered = self.get_object()
+        answered.last_related_activity = now()
+        answered.save()
+        other = factories.ArgumentFactory.create(
+            statement=self.statement, created_by=factories.UserFactory.create(customer=self.customer))
+        self.client.as_user(self.user)
+
+        flags = {
+            argument['id']: (argument['is_editable'], argument['is_deletable'])
+            for argument in self.get_list().data
+        }
+        self.assertEqual(flags, {
+            own.pk: (True, True),
+            answered.pk: (False, False),
+            other.pk: (False, False),
+        })
+
+        add_staff_permissions_to_user(self.user)
+        flags = {
+            argument['id']: (argument['is_editable'], argument['is_deletable'])
+            for argument in self.get_list().data
+        }
+        self.assertEqual(set(flags.values()), {(True, True)})
+
     def test_invalid_statement_id(self):
         data = self.get_create_data()
         data['statement_id'] = 999999999
@@ -893,6 +1208,42 @@ class CustomerAPITest(test.RetrieveTestMixin, test.BrabblAPITestCase):
         return reverse('v1:customer')
 
 
+class TranslationAPITest(test.BrabblAPITestCase):
+    def get(self, **headers):
+        self.client.as_customer(self.customer)
+        return self.client.get(reverse('v1:translation'), **headers)
+
+    def test_translation(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content.decode())['language'], 'en')
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertIn('X-Brabbl-Token', response['Vary'])
+
+        response = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_translation_per_language(self):
+        etag = self.get()['ETag']
+        self.customer.language = 'de'
+        self.customer.save()
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content.decode())['language'], 'de')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_rebuild_on_rosetta_save(self):
+        self.get()
+        content, etag = language_utils.get_translation_bundle()
+        self.assertIs(language_utils.get_translation_bundle()[0], content)
+
+        rosetta_post_save.send(sender=None, language_code='en', request=None)
+        self.get()
+        self.assertIsNot(language_utils.get_translation_bundle()[0], content)
+
+
 class NotificationWordingAPITest(test.RetrieveTestMixin, test.BrabblAPITestCase):
     base_name = 'notification_wording'
 
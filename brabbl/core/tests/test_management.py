@@ -1,11 +1,18 @@
 from datetime import datetime, timedelta
 
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
 from django.core import mail
 from django.test import TestCase
 
-from brabbl.accounts.models import User
+from brabbl.accounts.models import User, UserSession
 from brabbl.accounts.tests import factories
-from brabbl.core.management.commands import delete_non_confirmed_users, non_confirmed_users_warning_letter
+from brabbl.core.management.commands import (
+    clear_expired_sessions, delete_non_confirmed_users, index_user_sessions, non_confirmed_users_warning_letter,
+    rebuild_argument_ratings, rebuild_barometers
+)
+from brabbl.core.models import Argument, BarometerVote, Rating, Statement
+from brabbl.core.tests.factories import ArgumentFactory, SimpleDiscussionFactory
 
 
 class ManagementCommandsTestCase(TestCase):
@@ -26,3 +33,76 @@ class ManagementCommandsTestCase(TestCase):
     def test_delete_active_user(self):
         delete_non_confirmed_users.Command().handle()
         self.assertEqual(User.objects.filter(pk=self.user.pk).count(), User.objects.count())
+
+    def test_rebuild_barometers(self):
+        statement = SimpleDiscussionFactory.create().statements.get()
+        BarometerVote.objects.create(statement=statement, user=self.user, value=1)
+        BarometerVote.objects.create(statement=statement, user=self.non_confirmed_user, value=-1)
+        Statement.objects.update(barometer_count_plus_1=5, barometer_count_0=3, barometer_sum=9)
+
+        rebuild_barometers.Command().handle()
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.barometer_histogram, {
+            -3: 0, -2: 0, -1: 1, 0: 0, 1: 1, 2: 0, 3: 0})
+        self.assertEqual(statement.barometer_count, 2)
+        self.assertEqual(statement.barometer_sum, 0)
+        self.assertEqual(statement.barometer_value, 0)
+
+    def test_rebuild_argument_ratings(self):
+        argument = ArgumentFactory.create(
+            statement=SimpleDiscussionFactory.create().statements.get())
+        Rating.objects.create(argument=argument, user=self.user, value=4)
+        Rating.objects.create(argument=argument, user=self.non_confirmed_user, value=5)
+        Argument.objects.update(rating_count=7, rating_value=1, rating_sum=7)
+
+        rebuild_argument_ratings.Command().handle()
+        argument = Argument.objects.get(pk=argument.pk)
+        self.assertEqual(argument.rating_count, 2)
+        self.assertEqual(float(argument.rating_value), 4.5)
+        self.assertEqual(argument.rating_sum, 9)
+
+    def test_delete_non_confirmed_user_ratings(self):
+        argument = ArgumentFactory.create(
+            statement=SimpleDiscussionFactory.create().statements.get())
+        Rating.objects.create(argument=argument, user=self.user, value=4)
+        Rating.objects.create(argument=argument, user=self.non_confirmed_user, value=1)
+
+        delete_non_confirmed_users.Command().handle()
+        argument = Argument.objects.get(pk=argument.pk)
+        self.assertEqual(argument.rating_count, 1)
+        self.assertEqual(float(argument.rating_value), 4)
+
+    def test_clear_expired_sessions(self):
+        sessions = []
+        for expiry in [60, -60]:
+            session = SessionStore()
+            session['_auth_user_id'] = str(self.user.pk)
+            session.set_expiry(expiry)
+            session.create()
+            UserSession.objects.create(user=self.user, session_key=session.session_key)
+            sessions.append(session)
+        UserSession.objects.create(user=self.user, session_key='deleted')
+
+        clear_expired_sessions.Command().handle()
+        self.assertEqual(
+            list(UserSession.objects.values_list('session_key', flat=True)),
+            [sessions[0].session_key])
+        self.assertFalse(Session.objects.filter(session_key=sessions[1].session_key).exists())
+
+    def test_index_user_sessions(self):
+        sessions = []
+        for user in [self.user, self.user, self.non_confirmed_user, None]:
+            session = SessionStore()
+            if user is not None:
+                session['_auth_user_id'] = str(user.pk)
+            session.create()
+            sessions.append(session)
+        UserSession.objects.create(user=self.user, session_key='expired')
+
+        index_user_sessions.Command().index_sessions(chunk_size=2)
+        index_user_sessions.Command().handle()
+        self.assertEqual(
+            set(UserSession.objects.values_list('user_id', 'session_key')),
+            {(self.user.pk, sessions[0].session_key),
+             (self.user.pk, sessions[1].session_key),
+             (self.non_confirmed_user.pk, sessions[2].session_key)})
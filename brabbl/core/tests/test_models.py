@@ -1,7 +1,18 @@
+import hashlib
+from unittest import mock
+
+import fakeredis
+from rq import Queue
+
+from django.core.files.base import ContentFile
+from django.db import transaction
 from django.test import TestCase
 from django.conf import settings
 from . import factories
-from .. import models
+from .factories import make_image
+from .. import models, tasks
+from ..management.commands import generate_thumbnails
+from brabbl.utils.http import build_absolute_url
 from brabbl.utils.string import add_widget_hashtag
 
 
@@ -28,12 +39,41 @@ class DiscussionTest(TestCase):
         self.assertEqual(discussion.image_url, '')
         # self.assertEqual(discussion.image_url, 'http://ogp.me/logo.png')
 
-        with self.settings(TESTING=False):
-            discussion.save()  # trigger signal and task
+        tasks.get_discussion_image(discussion.pk)
 
         discussion = models.Discussion.objects.get(pk=discussion.pk)
         self.assertEqual(discussion.image_url, 'http://ogp.me/logo.png')
 
+    @mock.patch.object(transaction, 'on_commit', lambda func: func())
+    @mock.patch.object(tasks, 'enqueue_discussion_image')
+    def test_download_image_on_change(self, enqueue):
+        with self.settings(TESTING=False):
+            discussion = factories.SimpleDiscussionFactory(source_url='http://example.com/')
+            self.assertEqual(enqueue.call_count, 1)
+
+            discussion = models.Discussion.objects.get(pk=discussion.pk)
+            discussion.statement = 'Changed'
+            discussion.save()
+            self.assertEqual(enqueue.call_count, 1)
+
+            discussion.source_url = 'http://example.com/other'
+            discussion.save()
+            self.assertEqual(enqueue.call_count, 2)
+
+    def test_download_image_deduplicated(self):
+        queue = Queue(connection=fakeredis.FakeStrictRedis())
+        queue.connection.flushall()
+        discussion = factories.SimpleDiscussionFactory(source_url='http://example.com/')
+
+        with mock.patch.object(tasks, 'get_queue', return_value=queue):
+            job = tasks.enqueue_discussion_image(discussion)
+            self.assertEqual(tasks.enqueue_discussion_image(discussion).id, job.id)
+            self.assertEqual(queue.count, 1)
+
+            discussion.source_url = 'http://example.com/other'
+            self.assertNotEqual(tasks.enqueue_discussion_image(discussion).id, job.id)
+            self.assertEqual(queue.count, 2)
+
     def test_hash_striping(self):
         discussion = factories.SimpleDiscussionFactory()
         discussion.source_url = add_widget_hashtag(discussion.source_url)
@@ -41,6 +81,152 @@ class DiscussionTest(TestCase):
         self.assertNotIn(settings.WIDGET_HASHTAG, discussion.source_url)
 
 
+class DenormalizedFieldsTest(TestCase):
+    def test_save_keeps_denormalized_fields(self):
+        statement = factories.StatementFactory.create(
+            discussion=factories.ComplexDiscussionFactory.create())
+        models.Statement.objects.filter(pk=statement.pk).update(barometer_count=3)
+        statement.statement = 'Changed'
+        statement.save()
+
+        statement = models.Statement.objects.get(pk=statement.pk)
+        self.assertEqual((statement.statement, statement.barometer_count), ('Changed', 3))
+        with self.assertRaises(ValueError):
+            statement.save(update_fields=['barometer_count'])
+
+
+class ThumbnailsTest(TestCase):
+    def setUp(self):
+        self.discussion = factories.ComplexDiscussionFactory.create()
+
+    def test_generate_thumbnails(self):
+        statement = factories.StatementFactory.create(discussion=self.discussion, image=make_image())
+        self.assertEqual(statement.thumbnails, {})
+        self.assertEqual(statement.thumbnail_url('small'), build_absolute_url(statement.image.url))
+
+        tasks.generate_thumbnails('core.Statement', statement.pk, statement.image.name)
+        statement.refresh_from_db()
+        self.assertEqual(set(statement.thumbnails), {'small', 'preview'})
+        self.assertEqual(statement.thumbnail, statement.thumbnails['preview'])
+        self.assertIn('100x70', statement.thumbnail_url('preview'))
+
+    def test_replaced_image(self):
+        discussion = factories.SimpleDiscussionFactory.create(image=make_image())
+        old_name = discussion.image.name
+        tasks.generate_thumbnails('core.Discussion', discussion.pk, old_name)
+        discussion.refresh_from_db()
+        self.assertEqual(set(discussion.thumbnails), {'small', 'preview'})
+
+        discussion = models.Discussion.objects.get(pk=discussion.pk)
+        discussion.image = make_image('other.png')
+        discussion.save()
+        self.assertEqual(discussion.thumbnails, {})
+
+        # a job for the old image is outdated
+        tasks.generate_thumbnails('core.Discussion', discussion.pk, old_name)
+        discussion.refresh_from_db()
+        self.assertEqual(discussion.thumbnails, {})
+
+    def test_image_replaced_while_rendering(self):
+        discussion = factories.SimpleDiscussionFactory.create(image=make_image())
+        image_name = discussion.image.name
+
+        def replace_image(image, options):
+            models.Discussion.objects.filter(pk=discussion.pk).update(
+                image='images/discussion/other.png', thumbnails={})
+            return 'http://example.com/thumbnail.jpg'
+
+        with mock.patch.object(tasks, 'get_thumbnail_url', replace_image):
+            tasks.generate_thumbnails('core.Discussion', discussion.pk, image_name)
+        discussion.refresh_from_db()
+        self.assertEqual(discussion.image.name, 'images/discussion/other.png')
+        self.assertEqual(discussion.thumbnails, {})
+
+    @mock.patch.object(transaction, 'on_commit', lambda func: func())
+    @mock.patch.object(tasks, 'enqueue_thumbnails')
+    def test_enqueue_on_upload(self, enqueue):
+        with self.settings(TESTING=False), mock.patch.object(tasks, 'enqueue_discussion_image'):
+            statement = factories.StatementFactory.create(discussion=self.discussion)
+            self.assertEqual(enqueue.call_count, 0)
+
+            statement = models.Statement.objects.get(pk=statement.pk)
+            statement.image = make_image()
+            statement.save()
+            self.assertEqual(enqueue.call_count, 1)
+
+            statement.statement = 'Changed'
+            statement.save()
+            self.assertEqual(enqueue.call_count, 1)
+
+    def test_image_metadata(self):
+        image = make_image(size=(40, 30))
+        content = image.read()
+        discussion = factories.SimpleDiscussionFactory.create(image=image)
+        self.assertEqual((discussion.image_width, discussion.image_height), (40, 30))
+        self.assertEqual(discussion.image_size, len(content))
+        self.assertEqual(discussion.image_hash, hashlib.sha256(content).hexdigest())
+
+        discussion = models.Discussion.objects.get(pk=discussion.pk)
+        discussion.image = make_image(size=(20, 10))
+        discussion.save()
+        self.assertEqual((discussion.image_width, discussion.image_height), (20, 10))
+
+        discussion.image = None
+        discussion.save()
+        self.assertEqual((discussion.image_size, discussion.image_hash), (None, ''))
+
+    def test_generate_thumbnails_records_missing_metadata(self):
+        statement = factories.StatementFactory.create(discussion=self.discussion, image=make_image())
+        models.Statement.objects.filter(pk=statement.pk).update(image_size=None)
+
+        tasks.generate_thumbnails('core.Statement', statement.pk, statement.image.name)
+        statement.refresh_from_db()
+        self.assertEqual(statement.image_size, statement.image.size)
+
+    @mock.patch.object(transaction, 'on_commit', lambda func: func())
+    def test_downscale_image(self):
+        discussion = factories.SimpleDiscussionFactory.create(image=make_image(size=(400, 300)))
+        old_name = discussion.image.name
+        with self.settings(IMAGE_MAX_DIMENSION=200):
+            tasks.generate_thumbnails('core.Discussion', discussion.pk, old_name)
+            discussion.refresh_from_db()
+            self.assertNotEqual(discussion.image.name, old_name)
+            self.assertFalse(discussion.image.storage.exists(old_name))
+            self.assertEqual((discussion.image_width, discussion.image_height), (200, 150))
+            self.assertEqual(discussion.image_size, discussion.image.size)
+            self.assertEqual(discussion.thumbnails, {})
+
+            tasks.generate_thumbnails('core.Discussion', discussion.pk, discussion.image.name)
+            discussion.refresh_from_db()
+            self.assertEqual(set(discussion.thumbnails), {'small', 'preview'})
+
+    def test_image_replaced_while_downscaling(self):
+        discussion = factories.SimpleDiscussionFactory.create(image=make_image(size=(400, 300)))
+        image_name = discussion.image.name
+        storage = discussion.image.storage
+        files = storage.listdir('images/discussion')
+
+        def replace_image(content):
+            models.Discussion.objects.filter(pk=discussion.pk).update(
+                image='images/discussion/other.png')
+            return ContentFile(content)
+
+        with self.settings(IMAGE_MAX_DIMENSION=200), \
+                mock.patch.object(tasks, 'ContentFile', replace_image):
+            tasks.generate_thumbnails('core.Discussion', discussion.pk, image_name)
+        discussion.refresh_from_db()
+        self.assertEqual(discussion.image.name, 'images/discussion/other.png')
+        # the original is kept and the unused copy removed
+        self.assertEqual(storage.listdir('images/discussion'), files)
+
+    def test_generate_thumbnails_command(self):
+        factories.StatementFactory.create(discussion=self.discussion, image=make_image())
+        factories.StatementFactory.create(discussion=self.discussion)
+        with mock.patch.object(tasks, 'enqueue_thumbnails') as enqueue:
+            generate_thumbnails.Command().handle()
+        self.assertEqual(enqueue.call_count, 1)
+
+
 class NotificationWordingModel(TestCase):
     def test_save(self):
         wording = factories.NotificationWordingFactory.create()
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core import mail
 from django.test import TestCase
@@ -33,6 +34,49 @@ class StatementSignalTests(TestCase):
             self.assertEqual(statement.barometer_count, i + 1)
             self.assertAlmostEqual(float(statement.barometer_value), mean, places=1)
 
+    def test_denorm_histogram(self):
+        discussion = factories.SimpleDiscussionFactory.create()
+        statement = discussion.statements.all()[0]
+        users = factories.UserFactory.create_batch(3)
+
+        for user, value in zip(users, [2, 2, -3]):
+            BarometerVote.objects.create(statement=statement, user=user, value=value)
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.barometer_histogram, {
+            -3: 1, -2: 0, -1: 0, 0: 0, 1: 0, 2: 2, 3: 0})
+
+        vote = BarometerVote.objects.get(statement=statement, user=users[0])
+        vote.value = 0
+        vote.save()
+        BarometerVote.objects.get(statement=statement, user=users[2]).delete()
+        # a stale instance does not overwrite the histogram
+        statement.save()
+
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.barometer_histogram, {
+            -3: 0, -2: 0, -1: 0, 0: 1, 1: 0, 2: 1, 3: 0})
+        self.assertEqual(statement.barometer_count, 2)
+        self.assertEqual(statement.barometer_sum, 2)
+        self.assertEqual(float(statement.barometer_value), 1.0)
+
+    def test_denorm_values_on_delete(self):
+        discussion = factories.SimpleDiscussionFactory.create()
+        statement = discussion.statements.all()[0]
+        vote = BarometerVote.objects.create(
+            statement=statement, user=factories.UserFactory.create(), value=3)
+        BarometerVote.objects.create(
+            statement=statement, user=factories.UserFactory.create(), value=-2)
+
+        vote.delete()
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.barometer_count, 1)
+        self.assertEqual(float(statement.barometer_value), -2.0)
+
+        statement.barometer_votes.get().delete()
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.barometer_count, 0)
+        self.assertEqual(statement.barometer_value, 0)
+
 
 class ArgumentSignalTest(TestCase):
     def test_denorm_values(self):
@@ -66,13 +110,46 @@ class ArgumentSignalTest(TestCase):
         self.assertEqual(argument.rating_count, 0)
         self.assertEqual(argument.rating_value, 0)
 
+    def test_denorm_values_hidden_argument(self):
+        argument = factories.ArgumentFactory.create(
+            statement=factories.SimpleDiscussionFactory.create().statements.get())
+        users = factories.UserFactory.create_batch(3)
+        Rating.objects.create(argument=argument, user=users[0], value=4)
+        Rating.objects.create(argument=argument, user=users[1], value=2.5)
+
+        argument = Argument.objects.get(pk=argument.pk)
+        argument.status = Argument.STATUS_HIDDEN
+        argument.save()
+        # saving a hidden argument again keeps the original rating
+        argument.save()
+        Rating.objects.create(argument=argument, user=users[2], value=3)
+        Rating.objects.get(argument=argument, user=users[0]).delete()
+        argument = Argument.objects.get(pk=argument.pk)
+        self.assertEqual(argument.rating_count, 0)
+        self.assertEqual(argument.rating_value, 0)
+
+        argument.status = Argument.STATUS_ACTIVE
+        argument.save()
+        argument = Argument.objects.get(pk=argument.pk)
+        self.assertEqual(argument.rating_count, 2)
+        self.assertAlmostEqual(float(argument.rating_value), 2.8, places=1)
 
-def paired_iter(it):
-    token = next(it)
-    for lookahead in it:
-        yield (token, lookahead)
-        token = lookahead
-    yield (token, None)
+    def test_denorm_values_on_update_and_delete(self):
+        argument = factories.ArgumentFactory.create(
+            statement=factories.SimpleDiscussionFactory.create().statements.get())
+        user = factories.UserFactory.create()
+        Rating.objects.create(argument=argument, user=user, value=5)
+        Rating.objects.update_or_create(
+            argument=argument, user=user, defaults={'value': 1.5})
+
+        argument = Argument.objects.get(pk=argument.pk)
+        self.assertEqual(argument.rating_count, 1)
+        self.assertAlmostEqual(float(argument.rating_value), 1.5, places=1)
+
+        argument.ratings.get().delete()
+        argument = Argument.objects.get(pk=argument.pk)
+        self.assertEqual(argument.rating_count, 0)
+        self.assertEqual(argument.rating_value, settings.DEFAULT_USER_RATING)
 
 
 class LastActivityTest(TestCase):
@@ -82,14 +159,17 @@ class LastActivityTest(TestCase):
         self.assertEqual(discussion.last_related_activity, statement.modified_at)
 
     def assertLastActivity(self, objs):
-        for obj, peek in paired_iter(iter(objs)):
+        *ancestors, leaf = objs
+        for obj in ancestors:
             if not isinstance(obj, LastActivityMixin):  # Vote/Rating
                 continue
 
-            if peek is None:
-                self.assertEqual(obj.last_related_activity, None)
-            else:
-                self.assertEqual(obj.last_related_activity, peek.modified_at)
+            self.assertEqual(obj.last_related_activity, leaf.modified_at)
+            obj = type(obj).objects.get(pk=obj.pk)
+            self.assertEqual(obj.last_related_activity, leaf.modified_at)
+
+        if isinstance(leaf, LastActivityMixin):
+            self.assertEqual(leaf.last_related_activity, None)
 
     def test_last_activity_propagation(self):
         discussion = factories.ComplexDiscussionFactory()
@@ -127,6 +207,40 @@ class LastActivityTest(TestCase):
                                      value=1)
         self.assertLastActivity([discussion, statement, argument, vote])
 
+    def test_reply_rating_propagation(self):
+        discussion = factories.ComplexDiscussionFactory()
+        statement = factories.StatementFactory(discussion=discussion)
+        argument = factories.ArgumentFactory(statement=statement)
+        reply = factories.ArgumentFactory(statement=statement, reply_to=argument)
+
+        vote = Rating.objects.create(argument=reply,
+                                     user=argument.created_by,
+                                     value=1)
+        self.assertLastActivity([discussion, statement, argument, reply, vote])
+
+    def test_propagation_does_not_save_ancestors(self):
+        discussion = factories.ComplexDiscussionFactory()
+        statement = factories.StatementFactory(discussion=discussion)
+        modified_at = Statement.objects.get(pk=statement.pk).modified_at
+
+        argument = factories.ArgumentFactory(statement=statement)
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.modified_at, modified_at)
+        self.assertEqual(statement.last_related_activity, argument.modified_at)
+
+    def test_delete_keeps_activity(self):
+        # deletes are no activity, they must not lock authors out of editing
+        discussion = factories.ComplexDiscussionFactory()
+        statement = factories.StatementFactory(discussion=discussion)
+        argument = factories.ArgumentFactory(statement=statement)
+        rating = Rating.objects.create(argument=argument, user=argument.created_by, value=1)
+        Argument.objects.filter(pk=argument.pk).update(last_related_activity=None)
+        activity = Statement.objects.get(pk=statement.pk).last_related_activity
+
+        rating.delete()
+        self.assertEqual(Argument.objects.get(pk=argument.pk).last_related_activity, None)
+        self.assertEqual(Statement.objects.get(pk=statement.pk).last_related_activity, activity)
+
 
 class FlagSignalTests(TestCase):
     def setUp(self):
@@ -1,19 +1,30 @@
 from rest_framework import mixins, viewsets, status
 from rest_framework.views import APIView
-from rest_framework.decorators import detail_route
+from rest_framework.decorators import detail_route, list_route
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
 from django.views.generic import View
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.translation import ugettext_lazy as _
 
 from brabbl.accounts.models import Customer, EmailGroup, EmailTemplate
-from brabbl.utils.serializers import MultipleSerializersViewMixin
-from brabbl.utils.language_utils import frontend_interface_messages
-from . import serializers, models, permissions
+from brabbl.utils.barometer import cast_vote
+from brabbl.utils.rating import rate_argument
+from brabbl.utils.serializers import IMAGE_UPLOAD_PARSER_CLASSES, MultipleSerializersViewMixin
+from brabbl.utils.versions import get_version
+from brabbl.utils.vote_buffer import buffer_vote
+from brabbl.utils.language_utils import get_translation_bundle
+from . import conditional, loaders, payloads, serializers, models, permissions
 
 
 class TagViewSet(mixins.CreateModelMixin,
@@ -78,6 +89,7 @@ class DiscussionListViewSet(mixins.RetrieveModelMixin, mixins.CreateModelMixin,
 class DiscussionViewSet(MultipleSerializersViewMixin,
                         viewsets.ModelViewSet):
     permission_classes = [permissions.StaffOnlyWritePermission]
+    parser_classes = IMAGE_UPLOAD_PARSER_CLASSES
     serializer_class = serializers.DiscussionSerializer
     list_serializer_class = serializers.ListDiscussionSerializer
     update_serializer_class = serializers.UpdateDiscussionSerializer
@@ -100,6 +112,87 @@ class DiscussionViewSet(MultipleSerializersViewMixin,
     def get_queryset(self):
         return models.Discussion.objects.for_customer(self.request.customer).visible()
 
+    def get_activity(self):
+        """
+        The pk and last activity of the requested discussion, `None` if
+        there is no such discussion.
+        """
+        values = self.filter_queryset(self.get_queryset()).filter(
+            external_id=self.request.GET.get('external_id')
+        ).values_list('pk', 'modified_at', 'last_related_activity').first()
+        if values is None:
+            return None
+        pk, modified_at, last_related_activity = values
+        return pk, max(filter(None, [modified_at, last_related_activity]))
+
+    def get_validators(self, activity, personal=True):
+        if activity is None:
+            return None
+        pk, last_modified = activity
+        # deletes only change the version
+        version = get_version(payloads.get_discussion_version_key(pk))
+        return conditional.get_validators(
+            self.request, last_modified, pk, version, personal=personal)
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_anonymous:
+            # anonymous users get the shared payload
+            return self.shared(request, *args, **kwargs)
+
+        validators = self.get_validators(self.get_activity())
+        response = conditional.get_not_modified_response(request, validators)
+        if response is None:
+            instance = loaders.load_discussion_tree(self.get_object(), customer=request.customer)
+            context = self.get_serializer_context()
+            context['overlay'] = loaders.UserOverlay.for_discussion(request.user, instance)
+            serializer = self.get_serializer_class()(instance, context=context)
+            response = Response(serializer.data)
+        return conditional.patch_validators(response, validators)
+
+    def render_shared(self):
+        instance = loaders.load_discussion_tree(self.get_object(), customer=self.request.customer)
+        context = self.get_serializer_context()
+        context['overlay'] = loaders.UserOverlay(AnonymousUser())
+        serializer = serializers.DiscussionSerializer(instance, context=context)
+        return JSONRenderer().render(serializer.data)
+
+    @list_route(methods=['get'])
+    def shared(self, request, *args, **kwargs):
+        """
+        The discussion tree without any viewer specific fields, so the
+        same payload can be served to every user.
+        """
+        activity = self.get_activity()
+        if activity is None:
+            # the usual 404
+            self.get_object()
+
+        validators = self.get_validators(activity, personal=False)
+        response = conditional.get_not_modified_response(request, validators)
+        if response is None:
+            content = payloads.get_shared_payload(
+                request.customer, activity[0], request.GET.get('external_id'), self.render_shared)
+            response = HttpResponse(content, content_type='application/json')
+        return conditional.patch_validators(response, validators)
+
+    @list_route(methods=['get'])
+    def overlay(self, request, *args, **kwargs):
+        """
+        The viewer's votes, ratings and edit/delete rights for the
+        discussion returned by `shared`.
+        """
+        validators = self.get_validators(self.get_activity())
+        response = conditional.get_not_modified_response(request, validators)
+        if response is None:
+            instance = self.get_object()
+            instance.visible_statements, instance.visible_arguments = \
+                loaders.load_discussion_items(instance)
+            context = self.get_serializer_context()
+            context['overlay'] = loaders.UserOverlay.for_discussion(request.user, instance)
+            serializer = serializers.DiscussionOverlaySerializer(instance, context=context)
+            response = Response(serializer.data)
+        return conditional.patch_validators(response, validators)
+
     def partial_update(self, request, pk=None):
         current_multiple = request.data.get('multiple_statements_allowed')
         obj = self.get_object()
@@ -119,12 +212,32 @@ class StatementViewSet(MultipleSerializersViewMixin,
     permission_classes = [IsAuthenticatedOrReadOnly,
                           permissions.ActivityBasedObjectPermission,
                           permissions.OwnershipObjectPermission]
+    parser_classes = IMAGE_UPLOAD_PARSER_CLASSES
     serializer_class = serializers.StatementSerializer
     update_serializer_class = serializers.UpdateStatementSerializer
 
     def get_queryset(self):
         return models.Statement.objects.for_customer(self.request.customer).visible()
 
+    def get_list_validators(self):
+        # deleted discussions change the count, other deletes the version
+        activity = models.Discussion.objects.for_customer(self.request.customer).aggregate(
+            count=Count('pk'), modified_at=Max('modified_at'),
+            last_related_activity=Max('last_related_activity'))
+        last_modified = max(
+            filter(None, [activity['modified_at'], activity['last_related_activity']]),
+            default=None)
+        version = get_version(payloads.get_customer_discussions_version_key(self.request.customer.pk))
+        return conditional.get_validators(
+            self.request, last_modified, activity['count'], version, self.request.GET.urlencode())
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_list_validators()
+        response = conditional.get_not_modified_response(request, validators)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return conditional.patch_validators(response, validators)
+
     def perform_create(self, serializer):
         # we need to verify that it is allowed to create a new statement
         external_id = serializer.validated_data['discussion']['external_id']
@@ -150,26 +263,17 @@ class StatementViewSet(MultipleSerializersViewMixin,
         if not statement.discussion.has_barometer:
             raise PermissionDenied(_("Discussion has no barometer."))
 
-        user = request.user
-
-        try:
-            vote = statement.barometer_votes.get(user=user)
-        except models.BarometerVote.DoesNotExist:
-            vote = models.BarometerVote.objects.create(
-                statement=statement,
-                user=user,
-                value=serializer.validated_data['rating']
-            )
+        value = serializer.validated_data['rating']
+        if statement.discussion.buffered_votes:
+            # the barometer is updated with the next flush
+            buffer_vote(statement, request.user, value)
         else:
-            vote.value = serializer.validated_data['rating']
-            vote.save()
-
-        # refresh current statement
-        statement = models.Statement.objects.get(id=statement.id)
+            cast_vote(statement, request.user, value)
 
+        overlay = loaders.UserOverlay(request.user, votes={statement.pk: value})
         return Response(
             serializers.BarometerSerializer(
-                statement, context={'request': request}
+                statement, context={'request': request, 'overlay': overlay}
             ).data,
             status=status.HTTP_201_CREATED,
         )
@@ -232,19 +336,12 @@ class ArgumentViewSet(MultipleSerializersViewMixin,
         if argument.status == models.Argument.STATUS_HIDDEN:
             raise ValidationError(_("You can not rate hidden argument"))
 
-        user = request.user
-
-        models.Rating.objects.update_or_create(
-            user=user, argument=argument,
-            defaults={'value': serializer.validated_data['rating']}
-        )
-
-        # refresh current Argument
-        argument = models.Argument.objects.get(id=argument.id)
+        rating = rate_argument(argument, request.user, serializer.validated_data['rating'])
 
+        overlay = loaders.UserOverlay(request.user, ratings={argument.pk: rating.value})
         return Response(
             serializers.ArgumentRatingSerializer(
-                argument, context={'request': request}
+                argument, context={'request': request, 'overlay': overlay}
             ).data,
             status=status.HTTP_201_CREATED,
         )
@@ -291,7 +388,16 @@ class TranslationAPIView(APIView):
         """
         Return frontend's interface messages with translations.
         """
-        return Response(frontend_interface_messages())
+        content, etag = get_translation_bundle()
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        # the language depends on the customer
+        patch_vary_headers(response, ['X-Brabbl-Token'])
+        patch_cache_control(response, public=True, max_age=settings.TRANSLATION_CACHE_MAX_AGE)
+        return response
 
 
 class CustomerAPIView(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
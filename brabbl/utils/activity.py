@@ -0,0 +1,107 @@
+from django.db.models import Q
+
+from brabbl.core import payloads
+from brabbl.core.models import Argument, BarometerVote, Discussion, Rating, Statement
+
+
+model_herachie = {
+    Rating: ['argument'],
+    Argument: ['reply_to',
+               'statement'],
+    BarometerVote: ['statement'],
+    Statement: ['discussion'],
+}
+
+# lookups from each ancestor back to the changed object
+activity_ancestors = {
+    Rating: {
+        Argument: ['ratings', 'replies__ratings'],
+        Statement: ['arguments__ratings'],
+        Discussion: ['statements__arguments__ratings'],
+    },
+    Argument: {
+        Argument: ['replies'],
+        Statement: ['arguments'],
+        Discussion: ['statements__arguments'],
+    },
+    BarometerVote: {
+        Statement: ['barometer_votes'],
+        Discussion: ['statements__barometer_votes'],
+    },
+    Statement: {
+        Discussion: ['statements'],
+    },
+}
+
+
+def set_cached_last_related_activity(instance, new_datetime):
+    """
+    Keep the ancestors already loaded along with `instance` in sync with
+    the database.
+    """
+    for field in model_herachie.get(type(instance), []):
+        if not instance._meta.get_field(field).is_cached(instance):
+            continue
+        obj = getattr(instance, field)
+        if not obj:
+            continue
+
+        if not obj.last_related_activity or obj.last_related_activity < new_datetime:
+            obj.last_related_activity = new_datetime
+        set_cached_last_related_activity(obj, new_datetime)
+
+
+def propagate_last_related_activity(instance):
+    """
+    Set `last_related_activity` of all ancestors of `instance` to its
+    `modified_at`, unless they already have a newer activity. Outdates
+    the cached payload of the discussion.
+    """
+    try:
+        ancestors = activity_ancestors[type(instance)]
+    except KeyError:
+        return
+
+    new_datetime = instance.modified_at
+    is_older = Q(last_related_activity__isnull=True) | Q(last_related_activity__lt=new_datetime)
+
+    # one UPDATE per ancestor table, no model signals are sent
+    for model, lookups in ancestors.items():
+        related = get_related(lookups, instance.pk)
+        model.objects.filter(pk__in=model.objects.filter(related).values('pk')).filter(
+            is_older).update(last_related_activity=new_datetime)
+
+    set_cached_last_related_activity(instance, new_datetime)
+    payloads.invalidate_discussions(get_discussion_ids(instance))
+
+
+def get_related(lookups, pk):
+    related = Q()
+    for lookup in lookups:
+        related |= Q(**{lookup: pk})
+    return related
+
+
+def get_discussion_ids(instance):
+    if isinstance(instance, Statement):
+        return [instance.discussion_id]
+    lookups = activity_ancestors[type(instance)][Discussion]
+    return list(Discussion.objects.filter(
+        get_related(lookups, instance.pk)).values_list('pk', flat=True))
+
+
+def invalidate_deleted(instance):
+    """
+    Outdate the payloads and validators of the discussions `instance`
+    belongs to, before it is deleted. Deletes are no activity, see
+    `ActivityBasedObjectPermission`.
+    """
+    if isinstance(instance, Statement):
+        discussions = Discussion.objects.filter(pk=instance.discussion_id)
+    else:
+        discussions = Discussion.objects.filter(
+            get_related(activity_ancestors[type(instance)][Discussion], instance.pk))
+    discussions = list(discussions.values_list('pk', 'customer_id'))
+    payloads.invalidate_discussions(
+        [pk for pk, customer_id in discussions],
+        customer_ids={customer_id for pk, customer_id in discussions})
@@ -0,0 +1,130 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from brabbl.core.models import BarometerVote, Statement
+from brabbl.utils.activity import propagate_last_related_activity
+from brabbl.accounts.models import User
+from brabbl.utils.models import average, bulk_upsert, update_returning, upsert
+
+
+def update_barometer(statement_id, old_value=None, new_value=None):
+    """
+    Move one vote from `old_value` to `new_value` with a single UPDATE
+    of the statement's barometer. `old_value` is `None` for a created
+    vote and `new_value` is `None` for a deleted vote.
+
+    Returns the new values of the statement's barometer fields.
+    """
+    return update_barometer_votes(statement_id, [(old_value, new_value)])
+
+
+def update_barometer_votes(statement_id, moves):
+    """
+    Like `update_barometer` for many votes, `moves` are pairs of the old
+    and new value of each vote. The cost does not depend on the number
+    of votes of the statement.
+    """
+    moves = [(old_value, new_value) for old_value, new_value in moves if old_value != new_value]
+    if not moves:
+        return None
+    count_delta = sum((new_value is not None) - (old_value is not None)
+                      for old_value, new_value in moves)
+    sum_delta = sum((new_value or 0) - (old_value or 0) for old_value, new_value in moves)
+    histogram_deltas = Counter()
+    for old_value, new_value in moves:
+        if old_value is not None:
+            histogram_deltas[old_value] -= 1
+        if new_value is not None:
+            histogram_deltas[new_value] += 1
+    changes = {
+        'barometer_count': F('barometer_count') + count_delta,
+        'barometer_sum': F('barometer_sum') + sum_delta,
+        # SET expressions see the values before the update
+        'barometer_value': average(
+            F('barometer_sum') + sum_delta, F('barometer_count') + count_delta, 0),
+    }
+    for value, delta in histogram_deltas.items():
+        if delta:
+            field = Statement.barometer_count_field(value)
+            changes[field] = F(field) + delta
+    return update_returning(
+        Statement.objects.filter(pk=statement_id), Statement.denormalized_fields, **changes)
+
+
+def cast_vote(statement, user, value):
+    """
+    Set the vote of `user` for `statement` and update the barometer in
+    one transaction, safe under parallel requests of the same user.
+
+    Sends no model signals but does the work of their receivers. The
+    barometer fields of `statement` are updated in place.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        vote_id, old_values = upsert(
+            BarometerVote,
+            {'statement_id': statement.pk, 'user_id': user.pk},
+            {'value': value, 'modified_at': now},
+            create_values={'created_at': now})
+        old_value = old_values and old_values['value']
+        barometer = update_barometer(statement.pk, old_value=old_value, new_value=value)
+        vote = BarometerVote(
+            pk=vote_id, statement=statement, user=user, value=value, modified_at=now)
+        propagate_last_related_activity(vote)
+
+    for field, field_value in (barometer or {}).items():
+        setattr(statement, field, field_value)
+    return vote
+
+
+def rebuild_barometers(statements):
+    """
+    Recount the barometer of all `statements` with a single UPDATE.
+    """
+    votes = BarometerVote.objects.filter(
+        statement=OuterRef('pk')).order_by().values('statement')
+
+    def aggregate(votes, expression):
+        return Coalesce(Subquery(
+            votes.annotate(result=expression).values('result'),
+            output_field=IntegerField()), 0)
+
+    total = aggregate(votes, Sum('value'))
+    count = aggregate(votes, Count('pk'))
+    changes = {
+        'barometer_count': count,
+        'barometer_sum': total,
+        'barometer_value': average(total, count, 0),
+    }
+    for value in Statement.BAROMETER_VALUES:
+        changes[Statement.barometer_count_field(value)] = aggregate(
+            votes.filter(value=value), Count('pk'))
+    return statements.update(**changes)
+
+
+def apply_votes(statement_id, votes):
+    """
+    Write a batch of buffered `votes`, a dict of user id to value, and
+    update the statement's barometer by the difference once.
+    """
+    user_ids = set(User.objects.filter(pk__in=votes).values_list('pk', flat=True))
+    votes = {user_id: value for user_id, value in votes.items() if user_id in user_ids}
+    if not votes or not Statement.objects.filter(pk=statement_id).exists():
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        results = bulk_upsert(
+            BarometerVote, ('statement_id', 'user_id'),
+            [{'statement_id': statement_id, 'user_id': user_id, 'value': value, 'modified_at': now}
+             for user_id, value in votes.items()],
+            create_values={'created_at': now})
+        update_barometer_votes(statement_id, [
+            (old_values and old_values['value'], value)
+            for (vote_id, old_values), value in zip(results, votes.values())])
+        propagate_last_related_activity(
+            BarometerVote(pk=results[0][0], statement_id=statement_id, modified_at=now))
@@ -1,9 +1,26 @@
+import hashlib
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
 from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 
 from brabbl.utils.string import add_widget_hashtag
 
+# (connect, read) timeouts in seconds
+PROBE_TIMEOUT = (3.05, 5)
+# larger bodies of probe responses are never downloaded
+PROBE_MAX_BYTES = 64 * 1024
+URL_EXISTS_CACHE_TIMEOUT = getattr(settings, 'URL_EXISTS_CACHE_TIMEOUT', 60 * 60)
+# missing urls may show up soon, e.g. a thumbnail being generated
+URL_MISSING_CACHE_TIMEOUT = getattr(settings, 'URL_MISSING_CACHE_TIMEOUT', 5 * 60)
+
+_local = {'pid': None, 'session': None}
+
 
 def build_absolute_url(url_or_field):
     if callable(getattr(url_or_field, 'open', None)):
@@ -38,3 +55,65 @@ def get_next_url(next_url, user):
             next_url = user.customer.allowed_domains.splitlines()[0]
 
     return add_widget_hashtag(next_url)
+
+
+def get_session():
+    """
+    The `requests.Session` of this process, its connections are kept
+    alive and reused for further requests to the same hosts.
+    """
+    # pooled connections must not be shared with forked workers
+    if _local['pid'] != os.getpid():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.update(pid=os.getpid(), session=session)
+    return _local['session']
+
+
+def get_url_exists_key(url):
+    return 'brabbl:url-exists:%s' % hashlib.sha1(url.encode()).hexdigest()
+
+
+def release(response):
+    # a drained connection goes back to the pool, large bodies are dropped
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit() and int(length) <= PROBE_MAX_BYTES:
+        response.content
+    response.close()
+
+
+def probe_url(url):
+    """
+    Whether `url` answers with 200, asked with HEAD first. Servers which
+    don't answer HEAD properly are asked with GET without downloading
+    the body.
+    """
+    session = get_session()
+    try:
+        response = session.head(url, timeout=PROBE_TIMEOUT, allow_redirects=True)
+        release(response)
+        if response.status_code in (200, 404, 410):
+            return response.status_code == 200
+
+        response = session.get(url, timeout=PROBE_TIMEOUT, allow_redirects=True, stream=True)
+        release(response)
+        return response.status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def url_exists(url):
+    """
+    Cached `probe_url`, repeated checks of the same url don't touch the
+    network.
+    """
+    if not url:
+        return False
+    key = get_url_exists_key(url)
+    exists = cache.get(key)
+    if exists is None:
+        exists = probe_url(url)
+        cache.set(key, exists, URL_EXISTS_CACHE_TIMEOUT if exists else URL_MISSING_CACHE_TIMEOUT)
+    return exists
@@ -1,5 +1,17 @@
+import gettext
+import hashlib
+
 from django.utils import translation
-from django.utils.translation import ugettext as _
+from django.utils.translation import trans_real, ugettext as _
+from rest_framework.renderers import JSONRenderer
+
+from brabbl.utils.versions import bump_version, get_version
+
+TRANSLATION_VERSION_KEY = 'brabbl:translation-version'
+
+# rendered `frontend_interface_messages` per language: (content, etag)
+_translation_bundles = {}
+_loaded_translations = {'version': None}
 
 
 def set_language(request, lang):
@@ -287,3 +299,51 @@ def frontend_interface_messages():
                 "Really delete this discussion? (This cannot be undone!)"),
         }
     }
+
+
+def get_translation_bundle():
+    """
+    Return the JSON encoded `frontend_interface_messages` of the active
+    language and its ETag. Each language is only rendered once.
+    """
+    language = translation.get_language()
+    bundle = _translation_bundles.get(language)
+    if bundle is None:
+        content = JSONRenderer().render(frontend_interface_messages())
+        etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+        bundle = _translation_bundles[language] = (content, etag)
+    return bundle
+
+
+def clear_translation_bundles():
+    _translation_bundles.clear()
+
+
+def invalidate_translations():
+    """
+    Make every worker reload its catalogs on its next request.
+    """
+    bump_version(TRANSLATION_VERSION_KEY)
+
+
+def reload_translations():
+    """
+    Drop the loaded gettext catalogs and translation bundles of this
+    process. Requests activating a language afterwards read the catalogs
+    from disk again.
+    """
+    gettext._translations.clear()
+    trans_real._translations = {}
+    trans_real._default = None
+    clear_translation_bundles()
+
+
+def ensure_current_translations():
+    """
+    Reload the translations of this process if they were changed since
+    they were loaded, see `invalidate_translations`.
+    """
+    version = get_version(TRANSLATION_VERSION_KEY)
+    if _loaded_translations['version'] is not None and _loaded_translations['version'] != version:
+        reload_translations()
+    _loaded_translations['version'] = version
@@ -1,8 +1,12 @@
-from datetime import datetime
+import hashlib
 
 from brabbl.utils.http import build_absolute_url
-from django.db import models
-from django.contrib.sessions.models import Session
+from django.contrib.postgres.fields import JSONField
+from django.core.files.images import get_image_dimensions
+from django.db import connections, models
+from django.db.models import DecimalField, FloatField, Func, Value
+from django.db.models.sql import UpdateQuery
+from django.db.models.functions import Cast, Coalesce
 from django.utils.translation import ugettext_lazy as _
 from easy_thumbnails.files import get_thumbnailer
 
@@ -32,6 +36,313 @@ class LastActivityMixin(models.Model):
         abstract = True
 
 
+class TrackedFieldsMixin(object):
+    """
+    Remembers the values of `tracked_fields` as they were loaded from or
+    last saved to the database.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_tracked_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_tracked_fields()
+
+    def remember_tracked_fields(self):
+        # deferred fields are not loaded and therefore not known
+        self._loaded_values = {
+            field: self.__dict__[field]
+            for field in self.tracked_fields if field in self.__dict__
+        }
+
+    def get_loaded_value(self, field, default=None):
+        return getattr(self, '_loaded_values', {}).get(field, default)
+
+    def tracked_field_changed(self, field):
+        """
+        Whether `field` changed since it was loaded or last saved. Files
+        are compared by name, unknown values count as unchanged.
+        """
+        current = self.__dict__.get(field)
+        loaded = self.get_loaded_value(field, current)
+        if isinstance(self._meta.get_field(field), models.FileField):
+            return (getattr(loaded, 'name', loaded) or '') != (getattr(current, 'name', current) or '')
+        return loaded != current
+
+
+class ImageMetadataMixin(models.Model):
+    """
+    Dimensions, size and content hash of `image`, recorded at upload time
+    so reading them never touches the storage.
+    """
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_size = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    image_metadata_fields = ('image_width', 'image_height', 'image_size', 'image_hash')
+
+    class Meta:
+        abstract = True
+
+    def update_image_metadata(self):
+        """
+        Read the metadata from `image`. A new upload is read before it is
+        written to the storage.
+        """
+        image = self.image
+        if not image:
+            self.image_width = self.image_height = self.image_size = None
+            self.image_hash = ''
+            return
+
+        content_hash = hashlib.sha256()
+        for chunk in image.chunks():
+            content_hash.update(chunk)
+        self.image_width, self.image_height = get_image_dimensions(image)
+        self.image_size = image.size
+        self.image_hash = content_hash.hexdigest()
+
+
+class ThumbnailsMixin(models.Model):
+    """
+    The urls of the thumbnails of `image` by alias, see `THUMBNAIL_ALIASES`.
+    They are generated in the background after an upload, see
+    `brabbl.core.tasks.generate_thumbnails`.
+    """
+    thumbnails = JSONField(default=dict, blank=True, editable=False)
+
+    # the fields written by `set_thumbnails`
+    thumbnail_fields = ('thumbnails',)
+
+    class Meta:
+        abstract = True
+
+    def thumbnail_url(self, alias):
+        """
+        The url of the `alias` thumbnail, the original image until the
+        thumbnail is generated.
+        """
+        if not self.image:
+            return ''
+        return self.thumbnails.get(alias) or build_absolute_url(self.image.url)
+
+    def set_thumbnails(self, urls):
+        self.thumbnails = urls
+
+
+class DenormalizedFieldsMixin(object):
+    """
+    `denormalized_fields` are maintained by UPDATE queries only. Saving a
+    possibly stale instance leaves them untouched, naming them in
+    `update_fields` is an error.
+    """
+    denormalized_fields = ()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            denormalized = set(update_fields) & set(self.denormalized_fields)
+            if denormalized:
+                raise ValueError('The denormalized fields {} can not be saved.'.format(
+                    ', '.join(sorted(denormalized))))
+        elif not self._state.adding and not args and not kwargs.get('force_insert') and \
+                type(self)._base_manager.using(kwargs.get('using')).filter(pk=self.pk).exists():
+            # a deleted row is inserted again by the regular save below, deferred
+            # fields are left out like Django does
+            skipped = set(self.denormalized_fields) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped]
+        super().save(*args, **kwargs)
+
+
+class NullIf(Func):
+    function = 'NULLIF'
+    arity = 2
+
+
+def average(total, count, default):
+    """
+    Expression for `total / count` rounded like the denormalized
+    `DecimalField(max_digits=2, decimal_places=1)` columns, `default`
+    if `count` is zero.
+    """
+    return Cast(
+        Coalesce(Cast(total, FloatField()) / NullIf(count, Value(0)), Value(float(default))),
+        DecimalField(max_digits=2, decimal_places=1))
+
+
+def update_returning(queryset, returning, **kwargs):
+    """
+    Like `queryset.update(**kwargs)`, but returns the new values of the
+    `returning` fields of the (first) updated row, or `None`.
+    PostgreSQL only.
+    """
+    connection = connections[queryset.db]
+    meta = queryset.model._meta
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(kwargs)
+    compiler = query.get_compiler(queryset.db)
+    compiler.pre_sql_setup()
+    sql, params = compiler.as_sql()
+    columns = ', '.join(
+        connection.ops.quote_name(meta.get_field(field).column) for field in returning)
+    with connection.cursor() as cursor:
+        cursor.execute('{} RETURNING {}'.format(sql, columns), params)
+        row = cursor.fetchone()
+    return None if row is None else dict(zip(returning, row))
+
+
+def upsert(model, lookup, values, create_values=None, using='default'):
+    """
+    Create or update the row of `model` identified by the unique
+    `lookup`, also under concurrent requests for the same row.
+    `create_values` are only written to a created row.
+
+    Returns the primary key and the previous `values`, which are `None`
+    if the row was created. Must run inside a transaction.
+    PostgreSQL only.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = model._meta
+
+    def column(name):
+        return quote(meta.get_field(name).column)
+
+    def prepare(name, value):
+        return meta.get_field(name).get_db_prep_save(value, connection)
+
+    table = quote(meta.db_table)
+    pk = quote(meta.pk.column)
+    insert = dict(lookup, **values)
+    insert.update(create_values or {})
+    where = ' AND '.join('{} = %s'.format(column(name)) for name in lookup)
+    where_params = [prepare(name, value) for name, value in lookup.items()]
+
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+                'ON CONFLICT ({unique}) DO NOTHING RETURNING {pk}'.format(
+                    table=table, pk=pk,
+                    columns=', '.join(column(name) for name in insert),
+                    placeholders=', '.join(['%s'] * len(insert)),
+                    unique=', '.join(column(name) for name in lookup)),
+                [prepare(name, value) for name, value in insert.items()])
+            row = cursor.fetchone()
+            if row is not None:
+                return row[0], None
+
+            # the locked old row holds the latest committed values
+            cursor.execute(
+                'UPDATE {table} SET {assignments} FROM ('
+                'SELECT {pk}, {columns} FROM {table} WHERE {where} FOR UPDATE'
+                ') AS old WHERE {table}.{pk} = old.{pk} '
+                'RETURNING {table}.{pk}, {old_columns}'.format(
+                    table=table, pk=pk, where=where,
+                    assignments=', '.join('{} = %s'.format(column(name)) for name in values),
+                    columns=', '.join(column(name) for name in values),
+                    old_columns=', '.join('old.' + column(name) for name in values)),
+                [prepare(name, value) for name, value in values.items()] + where_params)
+            row = cursor.fetchone()
+            if row is not None:
+                return row[0], dict(zip(values, row[1:]))
+            # deleted in the meantime, insert again
+
+
+def bulk_upsert(model, unique, rows, create_values=None, using='default'):
+    """
+    Create or update all `rows`, dicts with the same field names. Rows
+    conflicting on the `unique` fields update the existing row instead,
+    also under concurrent requests for the same rows. `create_values`
+    are only written to created rows.
+
+    Returns the primary key and the previous values of every row in the
+    order of `rows`, the previous values are `None` for created rows.
+    Must run inside a transaction. PostgreSQL only.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = model._meta
+    create_values = create_values or {}
+    names = list(rows[0])
+    values = [name for name in names if name not in unique]
+    fields = {name: meta.get_field(name) for name in names + list(create_values)}
+    table = quote(meta.db_table)
+    pk = quote(meta.pk.column)
+
+    def column(name):
+        return quote(fields[name].column)
+
+    def new_column(name):
+        return quote('new_' + fields[name].column)
+
+    def rows_sql(rows, names):
+        placeholders = '({})'.format(', '.join(
+            '%s::{}'.format(fields[name].cast_db_type(connection)) for name in names))
+        params = [fields[name].get_db_prep_save(row[name], connection)
+                  for row in rows for name in names]
+        return ', '.join([placeholders] * len(rows)), params
+
+    def key(row):
+        return tuple(row[name] for name in unique)
+
+    results = {}
+    pending = {key(row): row for row in rows}
+    with connection.cursor() as cursor:
+        while pending:
+            # the locked old rows hold the latest committed values, rows are
+            # locked in a fixed order to avoid deadlocks with other batches
+            rows_values, params = rows_sql(pending.values(), names)
+            cursor.execute(
+                'UPDATE {table} SET {assignments} FROM ('
+                'SELECT {table}.{pk}, {columns}, new.* FROM {table} '
+                'JOIN (VALUES {rows}) AS new ({new_columns}) ON {join} '
+                'ORDER BY {table}.{pk} FOR UPDATE OF {table}'
+                ') AS old WHERE {table}.{pk} = old.{pk} '
+                'RETURNING {table}.{pk}, {old_columns}'.format(
+                    table=table, pk=pk, rows=rows_values,
+                    assignments=', '.join(
+                        '{} = old.{}'.format(column(name), new_column(name)) for name in values),
+                    columns=', '.join('{}.{}'.format(table, column(name)) for name in names),
+                    new_columns=', '.join(new_column(name) for name in names),
+                    join=' AND '.join('{}.{} = new.{}'.format(table, column(name), new_column(name))
+                                      for name in unique),
+                    old_columns=', '.join('old.' + column(name) for name in names)),
+                params)
+            for row in cursor.fetchall():
+                old = dict(zip(names, row[1:]))
+                results[key(old)] = row[0], {name: old[name] for name in values}
+                del pending[key(old)]
+            if not pending:
+                break
+
+            inserts = [dict(row, **create_values) for row in pending.values()]
+            insert_names = names + list(create_values)
+            rows_values, params = rows_sql(inserts, insert_names)
+            cursor.execute(
+                'INSERT INTO {table} ({columns}) VALUES {rows} '
+                'ON CONFLICT ({unique}) DO NOTHING RETURNING {pk}, {unique}'.format(
+                    table=table, pk=pk, rows=rows_values,
+                    columns=', '.join(column(name) for name in insert_names),
+                    unique=', '.join(column(name) for name in unique)),
+                params)
+            for row in cursor.fetchall():
+                created = dict(zip(unique, row[1:]))
+                results[key(created)] = row[0], None
+                del pending[key(created)]
+            # rows inserted concurrently in the meantime are updated again
+
+    return [results[key(row)] for row in rows]
+
+
 class SetOfPropertiesMixin(object):
     property_model = None
 
@@ -57,22 +368,6 @@ class SetOfPropertiesMixin(object):
                 property_model.objects.bulk_create(properties_for_create)
 
 
-def all_unexpired_sessions_for_user(user):
-    user_sessions = []
-    all_sessions = Session.objects.filter(expire_date__gte=datetime.now())
-    for session in all_sessions:
-        session_data = session.get_decoded()
-        if user.pk == int(session_data.get('_auth_user_id', 0)):
-            user_sessions.append(session)
-    return user_sessions
-
-
-def delete_all_unexpired_sessions_for_user(user, session_to_omit=None):
-    for session in all_unexpired_sessions_for_user(user):
-        if session is not session_to_omit:
-            session.delete()
-
-
 def get_thumbnail_url(image, options):
     return build_absolute_url(
         get_thumbnailer(image).get_thumbnail(options).url)
@@ -1,18 +1,149 @@
-from django.db.models import Avg
+from decimal import Decimal
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-def denormalize_argument_rating(argument):
+from brabbl.core.models import Argument, Rating
+from brabbl.utils.activity import propagate_last_related_activity
+from brabbl.utils.models import average, update_returning, upsert
+
+ACTIVE = {'status': Argument.STATUS_ACTIVE}
+
+
+def rating_average(total, count):
+    return average(total, count, settings.DEFAULT_USER_RATING)
+
+
+def as_decimal(value):
+    # a rating set from the API is a float until it is loaded again
+    return None if value is None else Decimal(str(value))
+
+
+def update_argument_rating(argument_id, old_value=None, new_value=None):
+    """
+    Move one rating from `old_value` to `new_value` with a single UPDATE
+    of the argument. `old_value` is `None` for a created rating and
+    `new_value` is `None` for a deleted rating.
+
+    Ratings of hidden arguments go to the `original_*_of_hidden_argument`
+    fields, which are restored when the argument becomes active again.
+
+    Returns the new values of the argument's rating fields.
+    """
+    old_value, new_value = as_decimal(old_value), as_decimal(new_value)
+    if old_value == new_value:
+        return None
+    count_delta = (new_value is not None) - (old_value is not None)
+    sum_delta = (new_value or 0) - (old_value or 0)
+    # SET expressions see the values before the update
+    total = F('rating_sum') + sum_delta
+    count = F('rating_count') + count_delta
+    hidden_count = F('original_rating_count_of_hidden_argument') + count_delta
+    return update_returning(
+        Argument.objects.filter(pk=argument_id), Argument.denormalized_fields,
+        rating_sum=total,
+        rating_count=Case(
+            When(then=count, **ACTIVE),
+            default=F('rating_count'), output_field=IntegerField()),
+        rating_value=Case(
+            When(then=rating_average(total, count), **ACTIVE),
+            default=F('rating_value'), output_field=DecimalField()),
+        original_rating_count_of_hidden_argument=Case(
+            When(then=F('original_rating_count_of_hidden_argument'), **ACTIVE),
+            default=hidden_count, output_field=IntegerField()),
+        original_rating_of_hidden_argument=Case(
+            When(then=F('original_rating_of_hidden_argument'), **ACTIVE),
+            default=rating_average(total, hidden_count), output_field=DecimalField()),
+    )
+
+
+def rate_argument(argument, user, value):
+    """
+    Set the rating of `user` for `argument` and update the argument's
+    rating in one transaction, safe under parallel requests of the same
+    user.
+
+    Sends no model signals but does the work of their receivers. The
+    rating fields of `argument` are updated in place.
+    """
+    now = timezone.now()
+    value = as_decimal(value)
+    with transaction.atomic():
+        rating_id, old_values = upsert(
+            Rating,
+            {'argument_id': argument.pk, 'user_id': user.pk},
+            {'value': value, 'modified_at': now},
+            create_values={'created_at': now})
+        old_value = old_values and old_values['value']
+        fields = update_argument_rating(argument.pk, old_value=old_value, new_value=value)
+        rating = Rating(
+            pk=rating_id, argument=argument, user=user, value=value, modified_at=now)
+        propagate_last_related_activity(rating)
+
+    for field, field_value in (fields or {}).items():
+        setattr(argument, field, field_value)
+    return rating
+
+
+def hide_argument_rating(argument):
+    """
+    Move the rating of a hidden `argument` out of sight.
+    """
+    Argument.objects.filter(pk=argument.pk).update(
+        original_rating_of_hidden_argument=F('rating_value'),
+        original_rating_count_of_hidden_argument=F('rating_count'),
+        rating_value=0,
+        rating_count=0,
+    )
+    argument.original_rating_of_hidden_argument = argument.rating_value
+    argument.original_rating_count_of_hidden_argument = argument.rating_count
+    argument.rating_value = 0
+    argument.rating_count = 0
+
+
+def restore_argument_rating(argument):
+    """
+    Restore the rating of an `argument` which is not hidden anymore.
+    """
+    Argument.objects.filter(pk=argument.pk).update(
+        rating_value=F('original_rating_of_hidden_argument'),
+        rating_count=F('original_rating_count_of_hidden_argument'),
+    )
+    argument.rating_value = argument.original_rating_of_hidden_argument
+    argument.rating_count = argument.original_rating_count_of_hidden_argument
+
+
+def rebuild_argument_ratings(arguments):
     """
-    Denormalize argument rating.
+    Recount the rating of all `arguments` with a single UPDATE.
 
-    Set to zero hidden argument's rating.
+    Only needed to reconcile the incrementally maintained values.
     """
-    if argument.status == argument.STATUS_ACTIVE:
-        total = argument.ratings.all().count()
-        avg = argument.ratings.all().aggregate(Avg('value'))['value__avg']
-    else:
-        total = 0
-        avg = 0
-    argument.rating_count = total
-    argument.rating_value = avg
-    argument.save()
+    ratings = Rating.objects.filter(
+        argument=OuterRef('pk')).order_by().values('argument')
+    total = Coalesce(Subquery(
+        ratings.annotate(total=Sum('value')).values('total'),
+        output_field=DecimalField()), Value(0))
+    count = Coalesce(Subquery(
+        ratings.annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField()), Value(0))
+    return arguments.update(
+        rating_sum=total,
+        rating_count=Case(
+            When(then=count, **ACTIVE),
+            default=Value(0), output_field=IntegerField()),
+        rating_value=Case(
+            When(then=rating_average(total, count), **ACTIVE),
+            default=Value(0), output_field=DecimalField()),
+        original_rating_count_of_hidden_argument=Case(
+            When(then=F('original_rating_count_of_hidden_argument'), **ACTIVE),
+            default=count, output_field=IntegerField()),
+        original_rating_of_hidden_argument=Case(
+            When(then=F('original_rating_of_hidden_argument'), **ACTIVE),
+            default=rating_average(total, count), output_field=DecimalField()),
+    )
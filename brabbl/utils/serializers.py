@@ -1,17 +1,20 @@
 import base64
 import imghdr
+import io
+import re
 import uuid
 
-from rest_framework import serializers, status
-from rest_framework.exceptions import APIException
+from rest_framework import serializers
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
-from rest_framework.request import clone_request
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile, UploadedFile
+from django.template.defaultfilters import filesizeformat
 from django.utils.translation import ugettext_lazy as _
 
+from brabbl.core.permissions import PermissionResolver
 from brabbl.utils.http import build_absolute_url
-from brabbl.utils.models import get_thumbnail_url
 
 
 class MultipleSerializersViewMixin(object):
@@ -56,20 +59,17 @@ class PermissionSerializerMixin(serializers.Serializer):
     is_editable = serializers.SerializerMethodField()
 
     def check_user_permission(self, obj, method):
-        view = self.context['view']
-        request = clone_request(self.context['request'], method)
-
-        if request.user.is_anonymous:
+        # a shared payload is rendered for an anonymous overlay
+        overlay = self.context.get('overlay')
+        user = overlay.user if overlay is not None else self.context['request'].user
+        if user.is_anonymous:
             return False
 
-        success = True
-
-        try:
-            view.check_object_permissions(request, obj)
-        except APIException as e:
-            success = status.is_success(e.status_code)
-
-        return success
+        # shared by all serializers rendering the same response
+        if 'permission_resolver' not in self.context:
+            self.context['permission_resolver'] = PermissionResolver(
+                self.context['view'], self.context['request'])
+        return self.context['permission_resolver'].has_object_permission(obj, method)
 
     def get_is_deletable(self, obj):
         return self.check_user_permission(obj, 'delete')
@@ -78,50 +78,100 @@ class PermissionSerializerMixin(serializers.Serializer):
         return self.check_user_permission(obj, 'patch')
 
 
+# views with image fields accept multipart uploads next to base64 encoded JSON
+IMAGE_UPLOAD_PARSER_CLASSES = (JSONParser, MultiPartParser, FormParser)
+
+
 class Base64ImageField(serializers.ImageField):
     """
     A django-rest-framework field for handling image-uploads through raw post data.
-    It uses base64 for en-/decoding the contents of the file.
+    It uses base64 for en-/decoding the contents of the file, plain uploaded
+    files are accepted as well, see `IMAGE_UPLOAD_PARSER_CLASSES`.
+
+    The content is decoded in chunks into memory or, like Django's own
+    uploads, into a temporary file if it exceeds `FILE_UPLOAD_MAX_MEMORY_SIZE`.
+    Images larger than `IMAGE_UPLOAD_MAX_SIZE` bytes are rejected.
 
     source: https://github.com/yigitguler/django-rest-framework/commit/c0298042
     """
     ALLOWED_IMAGE_TYPES = ('jpg', 'jpeg', 'png')
+    # characters decoded at once, a multiple of 4
+    CHUNK_SIZE = 64 * 1024
+    # bytes needed to tell the image type
+    HEADER_SIZE = 32
 
-    def to_internal_value(self, base64_data):
+    def to_internal_value(self, data):
         # Check if this is a base64 string
-        if isinstance(base64_data, str):
-            # Try to decode the file. Return validation error if it fails.
-            if 'data:' in base64_data and ';base64,' in base64_data:
-                # Break out the header from the base64 content
-                header, base64_data = base64_data.split(';base64,')
-
-            try:
-                decoded_file = base64.b64decode(base64_data)
-            except TypeError:
-                raise serializers.ValidationError(_("Picture could not be decoded."))
-
-            # Generate file name:
-            file_name = str(uuid.uuid4())[:12]  # 12 characters are more than enough.
-            # Get the file name extension:
-            file_extension = self.get_file_extension(file_name, decoded_file)
-            if file_extension not in self.ALLOWED_IMAGE_TYPES:
-                raise serializers.ValidationError(
-                    _("Please enter a valid image file."))
-            complete_file_name = file_name + "." + file_extension
-            data = ContentFile(decoded_file, name=complete_file_name)
+        if isinstance(data, str):
+            data = self.decode(data)
+        elif isinstance(data, UploadedFile):
+            self.check_size(data.size)
+            header = data.read(self.HEADER_SIZE)
+            data.seek(0)
+            data.name = self.get_file_name(header)
 
         return super(Base64ImageField, self).to_internal_value(data)
 
-    def get_file_extension(self, filename, decoded_file):
-        extension = imghdr.what(filename, decoded_file)
+    def check_size(self, size):
+        max_size = settings.IMAGE_UPLOAD_MAX_SIZE
+        if size > max_size:
+            raise serializers.ValidationError(
+                _("Picture is too large, at most %(size)s are allowed.") % {
+                    'size': filesizeformat(max_size)})
+
+    def get_file_name(self, header):
+        # Generate file name:
+        file_name = str(uuid.uuid4())[:12]  # 12 characters are more than enough.
+        # Get the file name extension:
+        file_extension = self.get_file_extension(file_name, header)
+        if file_extension not in self.ALLOWED_IMAGE_TYPES:
+            raise serializers.ValidationError(
+                _("Please enter a valid image file."))
+        return file_name + "." + file_extension
+
+    def decode(self, base64_data):
+        if 'data:' in base64_data and ';base64,' in base64_data:
+            # Break out the header from the base64 content
+            header, base64_data = base64_data.split(';base64,', 1)
+        if re.search(r'\s', base64_data):
+            base64_data = re.sub(r'\s+', '', base64_data)
+
+        # 4 characters encode 3 bytes, the size is known before decoding
+        size = len(base64_data) // 4 * 3 - base64_data[-2:].count('=')
+        self.check_size(size)
+
+        chunks = (base64_data[i:i + self.CHUNK_SIZE]
+                  for i in range(0, len(base64_data), self.CHUNK_SIZE))
+        upload = None
+        try:
+            content = base64.b64decode(next(chunks, ''), validate=True)
+            file_name = self.get_file_name(content[:self.HEADER_SIZE])
+            content_type = 'image/{}'.format(imghdr.what(None, content[:self.HEADER_SIZE]))
+            if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+                upload = TemporaryUploadedFile(file_name, content_type, size, None)
+            else:
+                upload = InMemoryUploadedFile(
+                    io.BytesIO(), None, file_name, content_type, size, None)
+            upload.write(content)
+            for chunk in chunks:
+                upload.write(base64.b64decode(chunk, validate=True))
+        # malformed base64 or non ascii characters
+        except ValueError:
+            if upload is not None:
+                upload.close()
+            raise serializers.ValidationError(_("Picture could not be decoded."))
+        upload.seek(0)
+        return upload
+
+    def get_file_extension(self, filename, header):
+        extension = imghdr.what(filename, header)
         extension = "jpg" if extension == "jpeg" else extension
         return extension
 
     def to_representation(self, image):
         if not image:
             return {}
-        options = {'size': (16, 16), 'crop': True}
         return {
-            'small': get_thumbnail_url(image, options),
+            'small': image.instance.thumbnail_url('small'),
             'original': build_absolute_url(image.url),
         }
@@ -0,0 +1,55 @@
+from threading import Thread
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from brabbl.core.models import BarometerVote, Statement
+from brabbl.core.tests import factories
+from brabbl.utils import barometer
+
+
+class CastVoteTest(TestCase):
+    def test_cast_vote(self):
+        statement = factories.SimpleDiscussionFactory.create().statements.get()
+        user = factories.UserFactory.create()
+
+        barometer.cast_vote(statement, factories.UserFactory.create(), 3)
+        barometer.cast_vote(statement, user, -1)
+        self.assertEqual(statement.barometer_count, 2)
+        self.assertEqual(float(statement.barometer_value), 1.0)
+
+        barometer.cast_vote(statement, user, 1)
+        self.assertEqual(statement.barometer_count, 2)
+        self.assertEqual(float(statement.barometer_value), 2.0)
+        self.assertEqual(BarometerVote.objects.get(user=user).value, 1)
+
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.barometer_histogram, {
+            -3: 0, -2: 0, -1: 0, 0: 0, 1: 1, 2: 0, 3: 1})
+        self.assertEqual(statement.last_related_activity,
+                         BarometerVote.objects.get(user=user).modified_at)
+
+
+class ParallelVoteTest(TransactionTestCase):
+    def test_parallel_votes_of_one_user(self):
+        statement = factories.SimpleDiscussionFactory.create().statements.get()
+        user = factories.UserFactory.create()
+
+        def vote(value):
+            try:
+                barometer.cast_vote(statement, user, value)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=vote, args=(value,)) for value in [1, 2, 3, -1, -2, -3] * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        vote = BarometerVote.objects.get(statement=statement, user=user)
+        statement = Statement.objects.get(pk=statement.pk)
+        self.assertEqual(statement.barometer_count, 1)
+        self.assertEqual(statement.barometer_sum, vote.value)
+        self.assertEqual(sum(statement.barometer_histogram.values()), 1)
+        self.assertEqual(statement.barometer_histogram[vote.value], 1)
@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from brabbl.utils import http
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_HEAD(self):
+        self.respond()
+
+    def do_GET(self):
+        self.respond()
+
+    def respond(self):
+        self.requests.append((self.command, self.path, self.client_address[1]))
+        if self.path == '/slow.png':
+            time.sleep(1)
+        if self.path == '/no-head.png' and self.command == 'HEAD':
+            status = 405
+        elif self.path in ('/image.png', '/other.png', '/no-head.png', '/slow.png'):
+            status = 200
+        else:
+            status = 404
+        body = b'x' * 100
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command == 'GET':
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class UrlExistsTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        ImageHandler.requests[:] = []
+
+    def url(self, path):
+        return 'http://127.0.0.1:%s%s' % (self.server.server_port, path)
+
+    def methods(self):
+        return [(method, path) for method, path, port in ImageHandler.requests]
+
+    def test_head_first(self):
+        self.assertTrue(http.url_exists(self.url('/image.png')))
+        self.assertEqual(self.methods(), [('HEAD', '/image.png')])
+
+    def test_cached(self):
+        self.assertTrue(http.url_exists(self.url('/image.png')))
+        self.assertFalse(http.url_exists(self.url('/missing.png')))
+        self.assertTrue(http.url_exists(self.url('/image.png')))
+        self.assertFalse(http.url_exists(self.url('/missing.png')))
+        self.assertEqual(self.methods(), [('HEAD', '/image.png'), ('HEAD', '/missing.png')])
+
+    def test_get_without_head(self):
+        self.assertTrue(http.url_exists(self.url('/no-head.png')))
+        self.assertEqual(self.methods(), [('HEAD', '/no-head.png'), ('GET', '/no-head.png')])
+
+    def test_connection_reused(self):
+        http.url_exists(self.url('/image.png'))
+        http.url_exists(self.url('/other.png'))
+        ports = {port for method, path, port in ImageHandler.requests}
+        self.assertEqual(len(ports), 1)
+
+    def test_timeout(self):
+        with mock.patch.object(http, 'PROBE_TIMEOUT', (1, 0.1)):
+            self.assertFalse(http.url_exists(self.url('/slow.png')))
+
+    def test_invalid_url(self):
+        self.assertFalse(http.url_exists(''))
+        self.assertFalse(http.url_exists('not a url'))
@@ -0,0 +1,24 @@
+from django.test import SimpleTestCase
+from django.utils import translation
+from django.utils.translation import trans_real
+
+from brabbl.utils import language_utils
+
+
+class TranslationReloadTest(SimpleTestCase):
+    def test_reload_after_invalidation(self):
+        language_utils.ensure_current_translations()
+        with translation.override('de'):
+            catalog = trans_real.translation('de')
+            content, etag = language_utils.get_translation_bundle()
+
+        # unchanged translations are kept
+        language_utils.ensure_current_translations()
+        self.assertIs(trans_real.translation('de'), catalog)
+
+        language_utils.invalidate_translations()
+        self.assertIs(trans_real.translation('de'), catalog)
+        language_utils.ensure_current_translations()
+        self.assertIsNot(trans_real.translation('de'), catalog)
+        with translation.override('de'):
+            self.assertEqual(language_utils.get_translation_bundle(), (content, etag))
@@ -0,0 +1,29 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from brabbl.core.models import Argument, Rating
+from brabbl.core.tests import factories
+from brabbl.utils import rating
+
+
+class RateArgumentTest(TestCase):
+    def test_rate_argument(self):
+        argument = factories.ArgumentFactory.create(
+            statement=factories.SimpleDiscussionFactory.create().statements.get())
+        user = factories.UserFactory.create()
+
+        rating.rate_argument(argument, factories.UserFactory.create(), 5)
+        rating.rate_argument(argument, user, 2)
+        self.assertEqual(argument.rating_count, 2)
+        self.assertEqual(argument.rating_value, Decimal('3.5'))
+
+        rating.rate_argument(argument, user, 4)
+        self.assertEqual(argument.rating_count, 2)
+        self.assertEqual(argument.rating_value, Decimal('4.5'))
+        self.assertEqual(Rating.objects.get(user=user).value, 4)
+
+        argument = Argument.objects.get(pk=argument.pk)
+        self.assertEqual(argument.rating_sum, 9)
+        self.assertEqual(argument.last_related_activity,
+                         Rating.objects.get(user=user).modified_at)
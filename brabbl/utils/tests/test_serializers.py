@@ -0,0 +1,49 @@
+import base64
+
+from rest_framework.serializers import ValidationError
+
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile, TemporaryUploadedFile
+from django.test import TestCase
+
+from brabbl.core.tests.factories import make_image
+from brabbl.utils.serializers import Base64ImageField
+
+
+class Base64ImageFieldTest(TestCase):
+    def setUp(self):
+        self.field = Base64ImageField()
+        self.content = make_image(size=(40, 30)).read()
+
+    def encode(self, content):
+        return 'data:image/png;base64,' + base64.b64encode(content).decode()
+
+    def test_decode(self):
+        image = self.field.to_internal_value(self.encode(self.content))
+        self.assertIsInstance(image, InMemoryUploadedFile)
+        self.assertTrue(image.name.endswith('.png'))
+        self.assertEqual(image.size, len(self.content))
+        self.assertEqual(image.read(), self.content)
+
+    def test_decode_into_temporary_file(self):
+        data = base64.encodebytes(self.content).decode()  # with line breaks
+        with self.settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024, IMAGE_UPLOAD_MAX_SIZE=len(self.content)):
+            image = self.field.to_internal_value(data)
+        self.assertIsInstance(image, TemporaryUploadedFile)
+        self.assertEqual(image.read(), self.content)
+
+    def test_size_limit(self):
+        with self.settings(IMAGE_UPLOAD_MAX_SIZE=len(self.content) - 1):
+            with self.assertRaises(ValidationError):
+                self.field.to_internal_value(self.encode(self.content))
+            with self.assertRaises(ValidationError):
+                self.field.to_internal_value(SimpleUploadedFile('image.png', self.content))
+
+    def test_invalid(self):
+        for data in ['not base64!', self.encode(b'GIF89a' + self.content), self.encode(b'')]:
+            with self.assertRaises(ValidationError):
+                self.field.to_internal_value(data)
+
+    def test_uploaded_file(self):
+        image = self.field.to_internal_value(SimpleUploadedFile('image.jpg', self.content))
+        self.assertTrue(image.name.endswith('.png'))
+        self.assertEqual(image.read(), self.content)
@@ -0,0 +1,119 @@
+from unittest import mock
+
+import fakeredis
+from django.db import transaction
+from django.test import TestCase
+
+from brabbl.core import loaders
+from brabbl.core.models import BarometerVote, Statement
+from brabbl.core.tests import factories
+from brabbl.utils import vote_buffer
+
+
+class VoteBufferTest(TestCase):
+    def setUp(self):
+        self.redis = redis = fakeredis.FakeStrictRedis()
+        redis.flushall()
+        patcher = mock.patch.object(vote_buffer, 'get_redis', return_value=redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.discussion = factories.SimpleDiscussionFactory.create(buffered_votes=True)
+        self.statement = self.discussion.statements.get()
+        self.user = factories.UserFactory.create()
+
+    def test_flush(self):
+        other = factories.UserFactory.create()
+        BarometerVote.objects.create(statement=self.statement, user=self.user, value=-3)
+        vote_buffer.buffer_vote(self.statement, self.user, 1)
+        vote_buffer.buffer_vote(self.statement, self.user, 2)
+        vote_buffer.buffer_vote(self.statement, other, 3)
+        self.assertEqual(BarometerVote.objects.get(user=self.user).value, -3)
+
+        self.assertEqual(vote_buffer.flush_buffered_votes(), 2)
+        self.assertEqual(BarometerVote.objects.get(user=self.user).value, 2)
+        self.assertEqual(BarometerVote.objects.get(user=other).value, 3)
+        statement = Statement.objects.get(pk=self.statement.pk)
+        self.assertEqual(statement.barometer_count, 2)
+        self.assertEqual(float(statement.barometer_value), 2.5)
+        self.assertEqual(statement.barometer_histogram[-3], 0)
+        self.assertIsNotNone(statement.last_related_activity)
+
+        self.assertEqual(vote_buffer.flush_buffered_votes(), 0)
+
+    def test_flush_applies_differences(self):
+        BarometerVote.objects.create(statement=self.statement, user=self.user, value=-3)
+        # the barometer is moved by the flushed votes instead of recounted
+        Statement.objects.filter(pk=self.statement.pk).update(
+            barometer_count=10, barometer_sum=-30, barometer_count_minus_3=10)
+        vote_buffer.buffer_vote(self.statement, self.user, 3)
+        vote_buffer.buffer_vote(self.statement, factories.UserFactory.create(), 3)
+
+        self.assertEqual(vote_buffer.flush_buffered_votes(), 2)
+        statement = Statement.objects.get(pk=self.statement.pk)
+        self.assertEqual(statement.barometer_count, 11)
+        self.assertEqual(statement.barometer_sum, -21)
+        self.assertEqual(statement.barometer_histogram[-3], 9)
+        self.assertEqual(statement.barometer_histogram[3], 2)
+
+    def test_flush_failed(self):
+        vote_buffer.buffer_vote(self.statement, self.user, 2)
+        with mock.patch.object(vote_buffer, 'apply_votes', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                vote_buffer.flush_buffered_votes()
+        self.assertFalse(BarometerVote.objects.exists())
+
+        self.assertEqual(vote_buffer.flush_buffered_votes(), 1)
+        self.assertEqual(BarometerVote.objects.get(user=self.user).value, 2)
+
+    def test_flush_after_died_flush(self):
+        vote_buffer.buffer_vote(self.statement, self.user, 2)
+        # a flush died after it took the votes
+        self.redis.spop(vote_buffer.PENDING_STATEMENTS_KEY)
+        self.redis.rename(vote_buffer.get_votes_key(self.statement.pk),
+                          vote_buffer.get_flushing_key(self.statement.pk))
+        overlay = loaders.UserOverlay.for_discussion(self.user, self.discussion)
+        self.assertEqual(overlay.vote_for(self.statement), 2)
+
+        self.assertEqual(vote_buffer.flush_buffered_votes(), 1)
+        self.assertEqual(BarometerVote.objects.get(user=self.user).value, 2)
+        self.assertEqual(self.redis.keys('brabbl:votes:*'), [])
+
+    def test_concurrent_flushes(self):
+        vote_buffer.buffer_vote(self.statement, self.user, 2)
+        flushing_key = vote_buffer.get_flushing_key(self.statement.pk)
+        concurrent = []
+
+        def apply_votes(statement_id, votes):
+            # another flush starts while the batch is applied
+            concurrent.append(vote_buffer.flush_buffered_votes())
+            self.assertTrue(self.redis.exists(flushing_key))
+            real_apply_votes(statement_id, votes)
+
+        real_apply_votes = vote_buffer.apply_votes
+        with mock.patch.object(vote_buffer, 'apply_votes', side_effect=apply_votes):
+            self.assertEqual(vote_buffer.flush_buffered_votes(), 1)
+        self.assertEqual(concurrent, [0])
+        self.assertEqual(BarometerVote.objects.get(user=self.user).value, 2)
+        self.assertEqual(self.redis.keys('brabbl:votes:*'), [])
+
+    @mock.patch.object(transaction, 'on_commit', lambda func: func())
+    def test_flush_when_unbuffered(self):
+        other = factories.SimpleDiscussionFactory.create(buffered_votes=True)
+        vote_buffer.buffer_vote(self.statement, self.user, 2)
+        vote_buffer.buffer_vote(other.statements.get(), self.user, 3)
+
+        self.discussion.buffered_votes = False
+        self.discussion.save()
+        self.assertEqual(BarometerVote.objects.get(user=self.user).value, 2)
+        self.assertFalse(self.redis.exists(vote_buffer.get_votes_key(self.statement.pk)))
+        self.assertEqual(vote_buffer.flush_buffered_votes(), 1)
+
+    def test_overlay_reads_pending_votes(self):
+        vote_buffer.buffer_vote(self.statement, self.user, -2)
+
+        overlay = loaders.UserOverlay.for_discussion(self.user, self.discussion)
+        self.assertEqual(overlay.vote_for(self.statement), -2)
+        overlay = loaders.UserOverlay.for_discussion(
+            factories.UserFactory.create(), self.discussion)
+        self.assertEqual(overlay.vote_for(self.statement), None)
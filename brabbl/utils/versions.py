@@ -0,0 +1,24 @@
+"""
+Version tokens kept in the shared cache.
+
+Workers compare the token of a key with the one they have seen before to
+find out whether something they derived from it is outdated. Bumping a
+version replaces the token, so invalidation never needs to find or delete
+the derived entries.
+"""
+import uuid
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # the token was evicted or never set, start a new generation
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    cache.set(key, uuid.uuid4().hex, timeout=None)
@@ -0,0 +1,137 @@
+"""
+Buffer for barometer votes of discussions with `buffered_votes`.
+
+Votes are collected in Redis, one hash of user id to value per
+statement, so repeated votes of a user are coalesced. The
+`flush_buffered_votes` command applies them in batches. The keys live in
+the DB of the `default` queue, which every environment has on its own.
+
+Only one flush runs at a time. A batch is renamed to a flushing key
+while it is applied and only deleted after the transaction committed, so
+votes of a flush which died halfway are applied by the next one. Applying
+a vote twice is harmless.
+"""
+from django_rq import get_connection
+from redis.exceptions import ResponseError
+
+from brabbl.core.conditional import invalidate_overlay
+from brabbl.utils.barometer import apply_votes
+
+PENDING_STATEMENTS_KEY = 'brabbl:votes:statements'
+FLUSHING_KEY_PREFIX = 'brabbl:votes:flushing:'
+FLUSH_LOCK_KEY = 'brabbl:votes:flush'
+# seconds until the lock of a flush which died is given up
+FLUSH_LOCK_TIMEOUT = 5 * 60
+
+
+def get_redis():
+    return get_connection('default')
+
+
+def get_votes_key(statement_id):
+    return 'brabbl:votes:{}'.format(statement_id)
+
+
+def get_flushing_key(statement_id):
+    return '{}{}'.format(FLUSHING_KEY_PREFIX, statement_id)
+
+
+def buffer_vote(statement, user, value):
+    pipe = get_redis().pipeline()
+    pipe.hset(get_votes_key(statement.pk), user.pk, value)
+    pipe.sadd(PENDING_STATEMENTS_KEY, statement.pk)
+    pipe.execute()
+    # the vote shows up in the user's overlay before it is applied
+    invalidate_overlay(user)
+
+
+def get_pending_votes(user, statement_ids):
+    """
+    The buffered votes of `user`, a dict of statement id to value.
+    """
+    statement_ids = list(statement_ids)
+    pipe = get_redis().pipeline(transaction=False)
+    for statement_id in statement_ids:
+        pipe.hget(get_votes_key(statement_id), user.pk)
+        # being applied right now
+        pipe.hget(get_flushing_key(statement_id), user.pk)
+    values = pipe.execute()
+    votes = {}
+    for statement_id, value, flushing_value in zip(statement_ids, values[::2], values[1::2]):
+        if value is None:
+            value = flushing_value
+        if value is not None:
+            votes[statement_id] = int(value)
+    return votes
+
+
+def requeue_flushing_votes(redis, statement_id):
+    """
+    Buffer the votes of an unfinished flush again, newer votes win.
+    """
+    flushing_key = get_flushing_key(statement_id)
+    votes = redis.hgetall(flushing_key)
+    pipe = redis.pipeline()
+    for user_id, value in votes.items():
+        pipe.hsetnx(get_votes_key(statement_id), user_id, value)
+    pipe.sadd(PENDING_STATEMENTS_KEY, statement_id)
+    pipe.delete(flushing_key)
+    pipe.execute()
+
+
+def flush_buffered_votes(statement_ids=None, blocking=False):
+    """
+    Apply the buffered votes of all statements or only of `statement_ids`,
+    one batch per statement. Skipped while another flush is running,
+    unless `blocking`. Returns the number of applied votes.
+    """
+    redis = get_redis()
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=blocking):
+        return 0
+    try:
+        return _flush_buffered_votes(redis, statement_ids)
+    finally:
+        lock.release()
+
+
+def _flush_buffered_votes(redis, statement_ids):
+    # left behind by flushes which died before they were done
+    for flushing_key in redis.scan_iter(match=FLUSHING_KEY_PREFIX + '*'):
+        requeue_flushing_votes(redis, int(flushing_key[len(FLUSHING_KEY_PREFIX):]))
+
+    if statement_ids is None:
+        pending = iter(lambda: redis.spop(PENDING_STATEMENTS_KEY), None)
+    else:
+        if statement_ids:
+            redis.srem(PENDING_STATEMENTS_KEY, *statement_ids)
+        pending = statement_ids
+
+    count = 0
+    postponed = []
+    for statement_id in pending:
+        statement_id = int(statement_id)
+        flushing_key = get_flushing_key(statement_id)
+        try:
+            if not redis.renamenx(get_votes_key(statement_id), flushing_key):
+                # still applied by a flush which outlived its lock
+                postponed.append(statement_id)
+                continue
+        except ResponseError:
+            # no votes left
+            continue
+
+        votes = {int(user_id): int(value)
+                 for user_id, value in redis.hgetall(flushing_key).items()}
+        try:
+            apply_votes(statement_id, votes)
+        except Exception:
+            # keep the votes for the next flush
+            requeue_flushing_votes(redis, statement_id)
+            raise
+        redis.delete(flushing_key)
+        count += len(votes)
+
+    if postponed:
+        redis.sadd(PENDING_STATEMENTS_KEY, *postponed)
+    return count
@@ -6,7 +6,6 @@ import django
 import dredd_hooks as hooks
 import json
 import re
-from django.conf import settings
 from django.core.management import call_command
 
 from brabbl.api.fixtures import BrabblFactory
@@ -42,7 +41,7 @@ def before_all_hooks(transaction):
 
 @hooks.after_all
 def after_all_hooks(transaction):
-    os.remove(settings.DATABASES['default']['NAME'])
+    call_command('flush', interactive=False)
 
 
 @hooks.before_each